@@ -0,0 +1,148 @@
+import asyncio
+import socket
+from typing import Dict, List, Optional, Tuple
+
+from pacing import PacingScheduler
+from rtp_sender import Buffer, send_datagrams
+from server import Server, main
+from server_worker import RtspSession
+
+
+class AsyncServerSession(RtspSession):
+    """
+    Asyncio counterpart of ServerWorker.
+
+    The RTSP connection is read by a coroutine and the stream is paced by a task on the
+    server's event loop, instead of two OS threads per client.
+    """
+
+    def __init__(self, server: "AsyncServer", reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        super().__init__(writer.get_extra_info('peername'),
+                         server.catalog,
+                         server.config_parser['Stream'],
+                         server.frame_cache,
+                         server.channels)
+        self.server = server
+        self.reader = reader
+        self.writer = writer
+
+        self.streaming_task: Optional[asyncio.Task] = None
+
+    async def run(self) -> None:
+        """Receive RTSP request from the client."""
+        try:
+            while True:
+                data: bytes = await self.reader.read(4096)
+                if not data:
+                    break
+
+                self.logger.debug(f"Data received: {data}")
+                self.receive_rtsp(data)
+        except ConnectionError:
+            pass
+        finally:
+            self._cleanup()
+
+    def send_rtsp(self, data: bytes) -> None:
+        self.writer.write(data)
+
+    def open_rtp(self) -> None:
+        # RTCP packets come from the client's RTP port, on the socket shared by all sessions
+        if self.rtp_port:
+            self.server.rtcp_sessions[(self.client_addr[0], self.rtp_port)] = self
+
+    def send_rtp(self, packets: List[List[Buffer]]) -> None:
+        # The socket is non-blocking, packets are dropped if its buffer is full, like any lost datagram
+        send_datagrams(self.server.rtp_socket, packets, (self.client_addr[0], self.rtp_port))
+
+    def start_streaming(self) -> None:
+        self.streaming_task = asyncio.get_running_loop().create_task(self.stream_video())
+
+    def stop_streaming(self) -> None:
+        if self.streaming_task:
+            self.streaming_task.cancel()
+            self.streaming_task = None
+
+    async def stream_video(self) -> None:
+        """Send a frame every frame interval until the task is cancelled."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time()
+        try:
+            self.logger.debug(f"Starting stream to client: {(self.client_addr[0], self.rtp_port)}")
+            while True:
+                # Deadlines advance by the frame interval on the loop's monotonic clock, so they don't drift
+                deadline += self.frame_interval
+                await asyncio.sleep(deadline - loop.time())
+
+                lateness = loop.time() - deadline
+                self.send_next_frame()
+                self.report_lateness(lateness)
+
+                if loop.time() - deadline > PacingScheduler.MAX_CATCH_UP:
+                    deadline = loop.time()
+        finally:
+            self.logger.debug("Stop streaming")
+            self.log_streaming_stats()
+
+    def _cleanup(self) -> None:
+        self.logger.info("Client has disconnected")
+        self.stop_sending()
+        if self.rtp_port:
+            self.server.rtcp_sessions.pop((self.client_addr[0], self.rtp_port), None)
+        self.writer.close()
+
+
+class AsyncServer(Server):
+    """Server handling every RTSP connection and RTP stream on a single event loop."""
+
+    def __init__(self, hostname: str = None, server_port: int = None, reuse_port: bool = False):
+        super().__init__(hostname, server_port, reuse_port)
+        self.rtp_socket: Optional[socket.socket] = None
+        self.rtcp_sessions: Dict[Tuple[str, int], AsyncServerSession] = {}
+
+    def serve(self):
+        try:
+            asyncio.run(self.serve_async())
+        except KeyboardInterrupt:
+            pass
+
+    async def serve_async(self) -> None:
+        # All sessions send their RTP packets through a single UDP socket
+        self.rtp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.rtp_socket.setblocking(False)
+        asyncio.get_running_loop().add_reader(self.rtp_socket, self.receive_rtcp)
+
+        # Live channels are paced by the scheduler thread, sessions streaming alone by the event loop
+        if self.channels:
+            self.scheduler.start()
+
+        self.bind()
+        rtsp_server = await asyncio.start_server(self.handle_connection, sock=self.rtsp_socket)
+
+        self.logger.info("Server Started")
+        async with rtsp_server:
+            await rtsp_server.serve_forever()
+
+    def receive_rtcp(self) -> None:
+        """Hand RTCP packets received on the RTP socket over to the sessions of their senders."""
+        while True:
+            try:
+                data, addr = self.rtp_socket.recvfrom(2048)
+            except BlockingIOError:
+                return
+            except OSError:
+                # ICMP errors about RTP packets sent earlier are reported by the next receive
+                continue
+
+            session = self.rtcp_sessions.get(addr[:2])
+            if session:
+                session.receive_rtcp(data)
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        client_addr = writer.get_extra_info('peername')
+        self.logger.debug(f"Client {client_addr[0]}:{client_addr[1]} has connected")
+        await AsyncServerSession(self, reader, writer).run()
+
+
+if __name__ == "__main__":
+    main(AsyncServer)
@@ -0,0 +1,76 @@
+"""
+Compare RTP packets sent per second by the concatenating `sendto` path and the
+scatter-gather `sendmsg` path.
+
+Usage: python benchmarks/bench_rtp_send.py [video file] [seconds per run]
+"""
+import pathlib
+import socket
+import sys
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from rtp_packet import RtpPacket, HEADER_SIZE, JPEG_HEADER_SIZE, DEFAULT_MAX_PACKET_SIZE, \
+    encode_jpeg_header, fragment_frame  # noqa: E402
+from rtp_sender import RtpSender, send_datagrams  # noqa: E402
+from video_stream import VideoStream  # noqa: E402
+
+FRAGMENT_SIZE = DEFAULT_MAX_PACKET_SIZE - HEADER_SIZE - JPEG_HEADER_SIZE
+
+
+def load_frames(video_file) -> list:
+    stream = VideoStream(video_file, use_mmap=True)
+    return [stream.frame_at(frame_nbr) for frame_nbr in range(stream.frame_count())]
+
+
+def send_concatenated(sock, address, frame, seq_num):
+    for offset, fragment in fragment_frame(frame, FRAGMENT_SIZE):
+        data = RtpPacket.encode(2, 0, 0, 0, 0, 26, seq_num, 0,
+                                encode_jpeg_header(offset, 384, 288) + fragment, timestamp=0)
+        sock.sendto(data, address)
+        seq_num = (seq_num + 1) & 0xffff
+    return seq_num
+
+
+def send_gathered(sock, address, frame, seq_num, sender=RtpSender(20, (384, 288))):
+    sender.seq_num = seq_num
+    send_datagrams(sock, sender.packetize(frame, 0), address)
+    return sender.seq_num
+
+
+def run(send, frames, duration) -> float:
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.bind(("127.0.0.1", 0))
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    packets = 0
+    seq_num = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        for frame in frames:
+            # Packets the receiver doesn't read are dropped by the kernel, which is fine here
+            new_seq_num = send(sender, receiver.getsockname(), frame, seq_num)
+            packets += (new_seq_num - seq_num) & 0xffff
+            seq_num = new_seq_num
+    elapsed = time.perf_counter() - start
+
+    sender.close()
+    receiver.close()
+    return packets / elapsed
+
+
+def main():
+    video_file = sys.argv[1] if len(sys.argv) > 1 else "videos/abc.mjpeg"
+    duration = float(sys.argv[2]) if len(sys.argv) > 2 else 3.0
+
+    frames = load_frames(video_file)
+    print(f"{len(frames)} frames from {video_file}, {FRAGMENT_SIZE} bytes fragments")
+
+    for name, send in (("sendto (header + payload)", send_concatenated),
+                       ("sendmsg (scatter-gather)", send_gathered)):
+        print(f"{name:28} {run(send, frames, duration):12,.0f} packets/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+Measure RTSP requests parsed per second, one request per segment and pipelined.
+
+Usage: python benchmarks/bench_rtsp_parser.py [seconds per run]
+"""
+import pathlib
+import sys
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from rtsp_parser import RtspParser  # noqa: E402
+
+REQUESTS = [
+    b"SETUP movie.mjpeg RTSP/1.0\nCSeq: 1\nTransport: RTP/UDP; client_port= 25000\n\n",
+    b"PLAY movie.mjpeg RTSP/1.0\nCSeq: 2\nSession: 123456\n\n",
+    b"PAUSE movie.mjpeg RTSP/1.0\nCSeq: 3\nSession: 123456\n\n",
+    b"DESCRIBE movie.mjpeg RTSP/1.0\nCSeq: 4\n\n",
+]
+
+
+def run(segments, duration: float) -> float:
+    parser = RtspParser()
+    parsed = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        for segment in segments:
+            parsed += len(parser.feed(segment))
+    return parsed / (time.perf_counter() - start)
+
+
+def main():
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 2.0
+
+    print(f"one request per segment: {run(REQUESTS, duration):,.0f} requests/s")
+    print(f"pipelined:               {run([b''.join(REQUESTS) * 8], duration):,.0f} requests/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+import logging
+import pathlib
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, FrozenSet, List, Optional, Sequence, Set, Tuple, Union
+
+from frame_cache import FrameCache
+from renditions import FULL, TranscodedStream, generate_rendition, rendition_is_current, rendition_path
+from transcode_cache import TranscodeCache
+from video_stream import DEFAULT_FRAME_RATE, SIDECAR_FIELDS, VideoStream, generate_video_info, load_video_info, \
+    video_info_is_current
+
+VIDEO_SUFFIX = ".mjpeg"
+
+
+class VideoCatalog:
+    """
+    Videos served from a folder and their metadata.
+
+    Info and index files of new or modified videos are generated in a process pool, in the
+    background while the server accepts clients. Until then, the info of a video is generated
+    on demand when requested.
+
+    The listing and infos are kept in memory along with the bodies of SWITCH and DESCRIBE
+    replies. At most every `check_interval` seconds, they are invalidated if the folder's mtime
+    has changed, and so are infos of videos modified in place.
+
+    Lower `renditions` of the videos are transcoded along with their info, and on demand
+    in a background thread for videos added or modified afterwards. Meanwhile, given a
+    `transcode_cache`, their frames are transcoded as they are streamed.
+    """
+
+    def __init__(self, video_path: pathlib.Path, frame_rate: int = DEFAULT_FRAME_RATE,
+                 check_interval: float = 1.0, renditions: Sequence[str] = (),
+                 transcode_cache: Optional[TranscodeCache] = None):
+        self.video_path: pathlib.Path = video_path
+        self.frame_rate: int = frame_rate
+        self.check_interval: float = check_interval
+        self.renditions: Tuple[str, ...] = tuple(renditions)
+        self.transcode_cache: Optional[TranscodeCache] = transcode_cache
+        self.logger = logging.getLogger("streaming-app.server.catalog")
+
+        # Renditions being generated, and the thread generating those requested on demand
+        self._pending_renditions: Set[Tuple[str, str]] = set()
+        self._rendition_executor: Optional[Executor] = None
+
+        self._lock = threading.Lock()
+        self._checked_at: float = 0.0
+        self._folder_mtime: int = 0
+        self._listing: Optional[bytes] = None
+        self._names: Optional[FrozenSet[str]] = None
+        # Filename to (size, mtime) of the video, info and DESCRIBE body
+        self._infos: Dict[str, Tuple[Tuple[int, int], Dict[str, str], bytes]] = {}
+
+    def video_files(self) -> List[pathlib.Path]:
+        return [file_path for file_path in self.video_path.iterdir() if file_path.suffix.lower() == VIDEO_SUFFIX]
+
+    def generate_infos(self, max_workers: Optional[int] = None) -> List[Future]:
+        """Start generating the info and renditions of outdated videos in a process pool, return without waiting."""
+        video_files = self.video_files()
+        outdated = [video_file for video_file in video_files if not video_info_is_current(video_file)]
+        outdated_renditions = [(video_file, rendition) for video_file in video_files for rendition in self.renditions
+                               if not rendition_is_current(video_file, rendition)]
+        if not outdated and not outdated_renditions:
+            return []
+
+        self.logger.info(f"Generating info of {len(outdated)} videos and {len(outdated_renditions)} renditions")
+        pool = ProcessPoolExecutor(max_workers)
+        futures = []
+        for video_file in outdated:
+            future = pool.submit(generate_video_info, video_file, self.frame_rate)
+            future.add_done_callback(lambda done, name=video_file.name: self._on_generated(name, done))
+            futures.append(future)
+        for video_file, rendition in outdated_renditions:
+            futures.append(self._submit_rendition(pool, video_file.name, rendition))
+
+        # Submitted videos are still processed, the pool exits once they are done
+        pool.shutdown(wait=False)
+        return futures
+
+    def listing(self) -> bytes:
+        """Return the body of SWITCH replies, the names of all videos."""
+        self._check_for_changes()
+        listing = self._listing
+        if listing is None:
+            listing = "".join(video_file.name + "\n" for video_file in self.video_files()).encode("utf-8")
+            with self._lock:
+                self._listing = listing
+        return listing
+
+    def has_video(self, filename: str) -> bool:
+        """Return whether `filename` is one of the listed videos, rather than any other file or path."""
+        self._check_for_changes()
+        names = self._names
+        if names is None:
+            names = frozenset(video_file.name for video_file in self.video_files())
+            with self._lock:
+                self._names = names
+        return filename in names
+
+    def get_info(self, filename: str) -> Optional[Dict[str, str]]:
+        """Return the info of a video, generating it if it is outdated, or None if there is no such video."""
+        entry = self._get_entry(filename)
+        return entry[1] if entry else None
+
+    def describe(self, filename: str) -> Optional[bytes]:
+        """Return the body of DESCRIBE replies for a video, or None if there is no such video."""
+        entry = self._get_entry(filename)
+        return entry[2] if entry else None
+
+    def rendition_file(self, filename: str, rendition: str) -> Optional[pathlib.Path]:
+        """
+        Return the file of a rendition of a video if it is up to date.
+
+        Otherwise, start generating it in the background and return None, if it is one of
+        the catalog's renditions.
+        """
+        if not self.has_video(filename):
+            return None
+        video_file = self.video_path / filename
+        if rendition == FULL:
+            return video_file
+        if rendition not in self.renditions:
+            return None
+        if rendition_is_current(video_file, rendition):
+            return rendition_path(video_file, rendition)
+
+        with self._lock:
+            if (filename, rendition) in self._pending_renditions:
+                return None
+            self._pending_renditions.add((filename, rendition))
+            if self._rendition_executor is None:
+                self._rendition_executor = ThreadPoolExecutor(1, thread_name_prefix="rendition")
+            executor = self._rendition_executor
+
+        self.logger.debug(f"Generating {rendition} rendition of {filename} on demand")
+        self._submit_rendition(executor, filename, rendition)
+        return None
+
+    def open_rendition(self, filename: str, rendition: str, use_mmap: bool = False,
+                       frame_cache: Optional[FrameCache] = None) -> Optional[Union[VideoStream, TranscodedStream]]:
+        """
+        Open a rendition of a video, raise IOError if it can't be read.
+
+        Until the rendition file is generated, its frames are transcoded as they are read if the
+        catalog has a transcode cache, otherwise None is returned.
+        """
+        video_file = self.rendition_file(filename, rendition)
+        if video_file is not None:
+            return VideoStream(video_file, use_mmap, frame_cache)
+        if self.transcode_cache is None or rendition not in self.renditions:
+            return None
+        return TranscodedStream(self.video_path / filename, rendition, self.transcode_cache, use_mmap, frame_cache)
+
+    def _get_entry(self, filename: str) -> Optional[Tuple[Tuple[int, int], Dict[str, str], bytes]]:
+        self._check_for_changes()
+        entry = self._infos.get(filename)
+        if entry is not None:
+            return entry
+
+        # Names come from clients, only videos right in the folder may be read or get sidecar files
+        if not self.has_video(filename):
+            return None
+        video_file = self.video_path / filename
+        try:
+            stat = video_file.stat()
+            if not video_file.is_file():
+                return None
+
+            if video_info_is_current(video_file):
+                info = load_video_info(video_file)
+            else:
+                self.logger.debug(f"Generating info of {filename} on demand")
+                info = generate_video_info(video_file, self.frame_rate)
+        except (OSError, ValueError) as err:
+            self.logger.warning(f"Failed to read info of {filename}: {err}")
+            return None
+
+        body = "".join(f"{key}={value}\n" for key, value in info.items() if key not in SIDECAR_FIELDS)
+        entry = ((stat.st_size, stat.st_mtime_ns), info, body.encode("utf-8"))
+        with self._lock:
+            self._infos[filename] = entry
+        return entry
+
+    def _check_for_changes(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if now - self._checked_at < self.check_interval:
+                return
+            self._checked_at = now
+
+            try:
+                folder_mtime = self.video_path.stat().st_mtime_ns
+            except OSError:
+                folder_mtime = 0
+            if folder_mtime != self._folder_mtime:
+                # Videos may have been added, removed or renamed
+                self._folder_mtime = folder_mtime
+                self._listing = None
+                self._names = None
+                self._infos.clear()
+                return
+
+            # Writing into a video doesn't change the folder's mtime
+            for filename, (version, _, _) in list(self._infos.items()):
+                try:
+                    stat = (self.video_path / filename).stat()
+                except OSError:
+                    del self._infos[filename]
+                    continue
+                if (stat.st_size, stat.st_mtime_ns) != version:
+                    del self._infos[filename]
+
+    def _submit_rendition(self, executor: Executor, filename: str, rendition: str) -> Future:
+        with self._lock:
+            self._pending_renditions.add((filename, rendition))
+        future = executor.submit(generate_rendition, self.video_path / filename, rendition)
+        # The callback runs right away if the rendition is already done, so the lock mustn't be held here
+        future.add_done_callback(lambda done: self._on_rendition_generated(filename, rendition, done))
+        return future
+
+    def _on_rendition_generated(self, filename: str, rendition: str, future: Future) -> None:
+        with self._lock:
+            self._pending_renditions.discard((filename, rendition))
+        if future.exception():
+            self.logger.error(f"Failed to generate {rendition} rendition of {filename}: {future.exception()}")
+        else:
+            self.logger.debug(f"Generated {rendition} rendition of {filename}")
+
+    def _on_generated(self, filename: str, future: Future) -> None:
+        if future.exception():
+            self.logger.error(f"Failed to generate info of {filename}: {future.exception()}")
+        else:
+            self.logger.debug(f"Generated info of {filename}")
@@ -1,20 +1,29 @@
 import configparser
 import errno
-import io
 import logging
 import socket
 import threading
 import time
 import tkinter as tk
-from queue import SimpleQueue
 from tkinter import messagebox
 from tkinter import ttk
-from typing import Optional, List
+from typing import Callable, Optional, List, Tuple
 
 from PIL import Image, ImageTk
 
-from client_utils import ClientState, RtspResponse, ServerDisconnected
+from client_utils import ClientState, RtspResponse, RtspChannel, FrameAssembler, DropOldestQueue, \
+    PlaybackStats, ReceptionStats, RESAMPLING_FILTERS, decode_frame
+from jitter_buffer import JitterBuffer
 from rtp_packet import RtpPacket
+from renditions import FULL, RENDITIONS, choose_rendition
+from rtcp_packet import RENDITION_REQUEST, AppPacket
+from rtsp_parser import parse_multicast_address
+
+
+# Interval between polls of decoded frames by the Tk main loop
+RENDER_POLL_INTERVAL = 5
+STATS_UPDATE_INTERVAL = 500
+RESPONSE_POLL_INTERVAL = 20
 
 
 class ResourceHolder(tuple):
@@ -37,13 +46,24 @@ class Client:
         self.connection_socket: Optional[socket.socket] = None
         self.stop_connect_event = threading.Event()
 
+        # Responses are received by a background thread and handled from the Tk main loop
+        self.rtsp_channel: Optional[RtspChannel] = None
+        self.state_change_pending: bool = False
+
         # RTP packet configuration
         self.rtp_socket: Optional[socket.socket] = None
         self.stream_stop_flag: threading.Event = threading.Event()
+        self.jitter_buffer: Optional[JitterBuffer] = None
+
+        # Rendition of the video to ask for, requested by the receive thread when it changes
+        self.video_resolution: Optional[Tuple[int, int]] = None
+        self.available_renditions: List[str] = [FULL]
+        self.wanted_rendition: Optional[str] = None
 
         self.resource_holder = ResourceHolder()
 
         self.label_txt = tk.StringVar()
+        self.stats_txt = tk.StringVar()
 
         self.opening_filename: Optional[str] = None
         # self.opening_filename: str = "abc.mjpeg"
@@ -62,9 +82,26 @@ class Client:
         # Canvas settings
         self.canvas_width: int = 0
         self.canvas_height: int = 0
-        self.canvas_buffer = None
+        # A single canvas item shows the video, its pixels are updated in place on every frame
+        self.canvas_buffer: Optional[ImageTk.PhotoImage] = None
+        self.canvas_image: Optional[int] = None
         self.video_buffer: Image = self.resource_holder.splash_screen
-        self.canvas_image_queue: SimpleQueue = SimpleQueue()
+
+        # Frames flow from the receive thread through the jitter buffer to the decode workers,
+        # then decoded images are handed over to the Tk main loop for rendering
+        self.decode_queue: DropOldestQueue = \
+            DropOldestQueue(self.config_parser.getint('Client', 'decode_queue_size'))
+        self.render_queue: DropOldestQueue = \
+            DropOldestQueue(self.config_parser.getint('Client', 'render_queue_size'))
+        self.last_rendered_frame: int = -1
+
+        # Frames that would be shown later than max_latency are dropped to catch up
+        self.max_latency: float = self.config_parser.getfloat('Client', 'max_latency')
+        self.playback_stats: PlaybackStats = PlaybackStats()
+        self.resampling: int = RESAMPLING_FILTERS[self.config_parser.get('Client', 'resampling')]
+        self.master.after(RENDER_POLL_INTERVAL, self._render_frames)
+        self.master.after(STATS_UPDATE_INTERVAL, self._update_stats)
+        self.master.after(RESPONSE_POLL_INTERVAL, self._dispatch_responses)
 
     def setup_video(self, event=None):
         if self.current_state == ClientState.DISCONNECTED:
@@ -73,30 +110,48 @@ class Client:
             messagebox.showerror("Error", "Video has already been setup")
         elif not self.opening_filename:
             messagebox.showerror("Error", "No video chosen")
-        else:
+        elif not self.state_change_pending:
             self.logger.debug("Setting video up")
 
-            self.setup_rtp()
+            # The multicast group is only known from the response
+            if self.config_parser.get('Client', 'transport', fallback="unicast") == "multicast":
+                transport = "RTP/UDP;multicast"
+            else:
+                self.setup_rtp()
+                transport = f"RTP/UDP; client_port= {self.rtp_socket.getsockname()[1]}"
 
             self.sequence_number += 1
             payload = f"SETUP {self.opening_filename} RTSP/1.0\n" \
                       f"CSeq: {self.sequence_number}\n" \
-                      f"Transport: RTP/UDP; client_port= {self.rtp_socket.getsockname()[1]}\n"
-            try:
-                response = RtspResponse(self.send_request(payload))
-            except ServerDisconnected:
-                self.logger.info("Server has disconnected")
-                self.disconnect_from_server()
-                return
-
-            if response.status_code == 200:
-                self.session_id = response.get_session_id()
-                self.current_state = ClientState.READY
-            elif response.status_code == 404:
-                messagebox.showerror("Error", "Video file not found")
-            elif response.status_code == 500:
-                messagebox.showerror("Error", "Connection error, please try again later")
-                self.disconnect_from_server()
+                      f"Transport: {transport}\n"
+            # In auto mode, the rendition is chosen from the canvas size once the video resolution is known
+            rendition = self.config_parser.get('Client', 'rendition', fallback="auto")
+            if rendition != "auto":
+                payload += f"Rendition: {rendition}\n"
+            self.send_request(payload, self._on_setup_response, changes_state=True)
+
+    def _on_setup_response(self, response: RtspResponse):
+        if response.status_code == 200:
+            multicast_address = parse_multicast_address(response.get_header("Transport") or "")
+            if multicast_address:
+                self.setup_rtp(multicast_address)
+
+            resolution = response.get_header("Resolution")
+            self.video_resolution = tuple(map(int, resolution.split('x'))) if resolution else None
+            self.available_renditions = [rendition.strip()
+                                         for rendition in (response.get_header("Renditions") or FULL).split(',')]
+            self.wanted_rendition = None
+            self._choose_rendition()
+
+            self.session_id = response.get_session_id()
+            self.current_state = ClientState.READY
+        elif response.status_code == 404:
+            messagebox.showerror("Error", "Video file not found")
+        elif response.status_code == 461:
+            messagebox.showerror("Error", "The server doesn't support multicast")
+        elif response.status_code == 500:
+            messagebox.showerror("Error", "Connection error, please try again later")
+            self.disconnect_from_server()
 
     def play_video(self, event=None):
         if self.current_state == ClientState.DISCONNECTED:
@@ -105,61 +160,57 @@ class Client:
             messagebox.showwarning("Warning", "The video is already playing")
         elif self.current_state == ClientState.INIT:
             messagebox.showwarning("Warning", "No video to play, press SETUP to choose one")
-        else:
+        elif not self.state_change_pending:
             self.logger.debug("Playing video")
 
             self.sequence_number += 1
             payload = f"PLAY {self.opening_filename} RTSP/1.0\n" \
                       f"CSeq: {self.sequence_number}\n" \
                       f"Session: {self.session_id}\n"
-            try:
-                response = RtspResponse(self.send_request(payload))
-            except ServerDisconnected:
-                self.disconnect_from_server()
-                return
-
-            if response.status_code == 200:
-                self.logger.debug(response.content)
-
-                self.current_state = ClientState.PLAYING
-                self.stream_stop_flag.clear()
-                threading.Thread(target=self.listen_rtp).start()
-            elif response.status_code == 404:
-                messagebox.showerror("Error", "Video file not found")
-            elif response.status_code == 500:
-                messagebox.showerror("Error", "Connection error, please try again later")
-                self.disconnect_from_server()
+            self.send_request(payload, self._on_play_response, changes_state=True)
+
+    def _on_play_response(self, response: RtspResponse):
+        if response.status_code == 200:
+            self.logger.debug(response.content)
+
+            self.current_state = ClientState.PLAYING
+            self.stream_stop_flag.clear()
+            self.jitter_buffer = JitterBuffer(self.config_parser.getint('Client', 'jitter_buffer_depth'))
+            threading.Thread(target=self.listen_rtp).start()
+            threading.Thread(target=self.play_frames).start()
+            for _ in range(self.config_parser.getint('Client', 'decode_workers')):
+                threading.Thread(target=self.decode_frames).start()
+        elif response.status_code == 404:
+            messagebox.showerror("Error", "Video file not found")
+        elif response.status_code == 500:
+            messagebox.showerror("Error", "Connection error, please try again later")
+            self.disconnect_from_server()
 
     def pause_video(self, event=None):
         if self.current_state == ClientState.DISCONNECTED:
             messagebox.showerror("Error", "Not connected to a server")
         elif self.current_state == ClientState.INIT or self.current_state == ClientState.READY:
             messagebox.showwarning("Warning", "The video is already paused")
-        else:
+        elif not self.state_change_pending:
             self.logger.debug("Pausing video")
 
             self.sequence_number += 1
             payload = f"PAUSE {self.opening_filename} RTSP/1.0\n" \
                       f"CSeq: {self.sequence_number}\n" \
                       f"Session: {self.session_id}\n"
-            try:
-                response = RtspResponse(self.send_request(payload))
-            except ConnectionError:
-                self.stream_stop_flag.set()
-                self.disconnect_from_server()
-                self.sequence_number -= 1
-                return
-
-            if response.status_code == 200:
-                self.logger.debug(response.content)
-
-                self.current_state = ClientState.READY
-                self.stream_stop_flag.set()
-            elif response.status_code == 404:
-                messagebox.showerror("Error", "Video file not found")
-            elif response.status_code == 500:
-                messagebox.showerror("Error", "Connection error, please try again later")
-                self.disconnect_from_server()
+            self.send_request(payload, self._on_pause_response, changes_state=True)
+
+    def _on_pause_response(self, response: RtspResponse):
+        if response.status_code == 200:
+            self.logger.debug(response.content)
+
+            self.current_state = ClientState.READY
+            self.stream_stop_flag.set()
+        elif response.status_code == 404:
+            messagebox.showerror("Error", "Video file not found")
+        elif response.status_code == 500:
+            messagebox.showerror("Error", "Connection error, please try again later")
+            self.disconnect_from_server()
 
     def stop_video(self, event=None):
         if self.current_state == ClientState.DISCONNECTED:
@@ -173,28 +224,23 @@ class Client:
             payload = f"TEARDOWN {self.opening_filename} RTSP/1.0\n" \
                       f"CSeq: {self.sequence_number}\n" \
                       f"Session: {self.session_id}\n"
+            self.send_request(payload, self._on_teardown_response, changes_state=True)
 
-            try:
-                response = RtspResponse(self.send_request(payload))
-            except ServerDisconnected:
-                self.disconnect_from_server()
-                self.stream_stop_flag.set()
-                return
-
-            if response.status_code == 200:
-                self.logger.debug(response.content)
+    def _on_teardown_response(self, response: RtspResponse):
+        if response.status_code == 200:
+            self.logger.debug(response.content)
 
-                # Re-set splash screen
-                self.video_buffer = self.resource_holder.splash_screen.resize((self.canvas_width, self.canvas_height))
-                self._update_image()
+            # Stop rendering and re-set splash screen
+            self.stream_stop_flag.set()
+            self.video_buffer = self.resource_holder.splash_screen.resize((self.canvas_width, self.canvas_height))
+            self._update_image()
 
-                self.current_state = ClientState.INIT
-                self.stream_stop_flag.set()
-            elif response.status_code == 404:
-                messagebox.showerror("Error", "Video file not found")
-            elif response.status_code == 500:
-                messagebox.showerror("Error", "Connection error, please try again later")
-                self._on_close()
+            self.current_state = ClientState.INIT
+        elif response.status_code == 404:
+            messagebox.showerror("Error", "Video file not found")
+        elif response.status_code == 500:
+            messagebox.showerror("Error", "Connection error, please try again later")
+            self._on_close()
 
     def describe_video(self, event=None):
         if self.current_state == ClientState.DISCONNECTED:
@@ -210,15 +256,9 @@ class Client:
         self.sequence_number += 1
         payload = f"DESCRIBE {self.opening_filename} RTSP/1.0\n" \
                   f"CSeq: {self.sequence_number}\n"
+        self.send_request(payload, self._on_describe_response)
 
-        try:
-            response = RtspResponse(self.send_request(payload))
-        except ConnectionError:
-            self.stream_stop_flag.set()
-            self.connect_to_server()
-            self.sequence_number -= 1
-            return
-
+    def _on_describe_response(self, response: RtspResponse):
         if response.status_code == 200:
             self.logger.debug(response.get_other_line())
             DescribeWindow(self.master, response.get_other_line()[:-1])
@@ -233,15 +273,9 @@ class Client:
         self.sequence_number += 1
         payload = f"SWITCH RTSP/1.0\n" \
                   f"CSeq: {self.sequence_number}\n"
+        self.send_request(payload, self._on_switch_response)
 
-        try:
-            response = RtspResponse(self.send_request(payload))
-        except ConnectionError:
-            self.stream_stop_flag.set()
-            self.connect_to_server()
-            self.sequence_number -= 1
-            return
-
+    def _on_switch_response(self, response: RtspResponse):
         if response.status_code == 200:
             self.logger.debug(response.get_other_line()[:-1])
             SwitchWindow(self, response.get_other_line()[:-1])
@@ -266,6 +300,9 @@ class Client:
         title_label = tk.Label(title_container, textvariable=self.label_txt)
         title_label.pack(side=tk.LEFT, fill=tk.X, expand=1)
 
+        stats_label = tk.Label(title_container, textvariable=self.stats_txt)
+        stats_label.pack(side=tk.LEFT, padx=8)
+
         setting_btn = tk.Button(title_container, image=self.resource_holder.setting_icon,
                                 height=30, width=30,
                                 command=lambda: SettingWindow(self.master, self, self.config_parser))
@@ -322,6 +359,8 @@ class Client:
         if self.current_state == ClientState.PLAYING:
             self.stop_video()
 
+        # The connection is closed before the TEARDOWN response can be handled
+        self.stream_stop_flag.set()
         self.disconnect_from_server()
         if self.rtp_socket:
             self.rtp_socket.close()
@@ -334,6 +373,12 @@ class Client:
 
         self.video_buffer = self.video_buffer.resize((self.canvas_width, self.canvas_height))
         self._update_image()
+        self._choose_rendition()
+
+    def _choose_rendition(self):
+        if self.config_parser.get('Client', 'rendition', fallback="auto") == "auto" and self.video_resolution:
+            self.wanted_rendition = choose_rendition(self.video_resolution, (self.canvas_width, self.canvas_height),
+                                                     self.available_renditions)
 
     def connect_to_server(self):
         def _connect_to_server():
@@ -357,6 +402,9 @@ class Client:
                     self.connection_socket = None
                     time.sleep(self.config_parser.getint('Connection', 'delay_between_retry'))
                 else:
+                    self.rtsp_channel = RtspChannel(self.connection_socket,
+                                                    self.config_parser.getint('Client', 'rtsp_buffer_size'),
+                                                    self._on_server_disconnected)
                     self.current_state = ClientState.INIT
                     self.label_txt.set("Connected")
                     self.sequence_number = 0
@@ -372,15 +420,11 @@ class Client:
 
     def disconnect_from_server(self):
         self.stop_connect_event.set()
-        if self.connection_socket:
-            try:
-                self.connection_socket.shutdown(socket.SHUT_WR)
-                self.connection_socket.close()
-            except OSError as err:
-                if err.errno != errno.ENOTCONN:
-                    raise err
-
-            self.connection_socket = None
+        if self.rtsp_channel:
+            self.rtsp_channel.close()
+            self.rtsp_channel = None
+        self.connection_socket = None
+        self.state_change_pending = False
         self.current_state = ClientState.DISCONNECTED
         self.label_txt.set("Disconnected")
         self.opening_filename = None
@@ -390,45 +434,78 @@ class Client:
         self.disconnect_from_server()
         self.connect_to_server()
 
-    def send_request(self, request: str) -> str:
-        try:
-            self.connection_socket.sendall(request.encode("utf-8"))
-        except OSError as err:
-            if err.errno == errno.EPIPE:
-                raise ServerDisconnected()
-            else:
-                raise err
+    def send_request(self, request: str, callback: Callable[[RtspResponse], None], changes_state: bool = False):
+        """
+        Send a request without waiting for its response, `callback` is called with it from the Tk main loop.
+
+        Requests changing the session state are sent one at a time, others can be pipelined.
+        """
+        if changes_state:
+            self.state_change_pending = True
+
+            def callback(response: RtspResponse, on_response=callback):
+                self.state_change_pending = False
+                on_response(response)
 
-        response: bytes = self.connection_socket.recv(self.config_parser.getint('Client', 'rtsp_buffer_size'))
-        if not response:
-            raise ServerDisconnected()
-        return response.decode("utf-8")
+        self.rtsp_channel.send(self.sequence_number, request, callback)
+
+    def _on_server_disconnected(self):
+        self.logger.info("Server has disconnected")
+        self.stream_stop_flag.set()
+        self.disconnect_from_server()
 
-    def setup_rtp(self):
+    def _dispatch_responses(self):
+        if self.rtsp_channel:
+            self.rtsp_channel.dispatch()
+        self.master.after(RESPONSE_POLL_INTERVAL, self._dispatch_responses)
+
+    def setup_rtp(self, multicast_address: Optional[Tuple[str, int]] = None):
+        """Open the RTP socket, on an ephemeral port or joined to the multicast group of the stream."""
         self.rtp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.rtp_socket.settimeout(0.5)
         try:
-            self.rtp_socket.bind(("", 0))
+            if multicast_address:
+                group, port = multicast_address
+                # Other clients on this host may watch the same group
+                self.rtp_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+                self.rtp_socket.bind(("", port))
+
+                interface = self.config_parser.get('Client', 'multicast_interface', fallback="0.0.0.0")
+                membership = socket.inet_aton(group) + socket.inet_aton(interface)
+                self.rtp_socket.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+            else:
+                self.rtp_socket.bind(("", 0))
         except socket.error:
             print("An error occurred while setting UDP port, please try again later")
 
     def listen_rtp(self):
         self.logger.debug("Listening for streams")
         self.rtp_socket.settimeout(0.5)
+        frame_assembler = FrameAssembler()
+
+        # Datagrams are received into a single buffer, fragments are copied out by the assembler
+        rtp_buffer = memoryview(bytearray(self.config_parser.getint('Client', 'rtp_buffer_size')))
+        rtp_packet = RtpPacket()
+
+        # Receiver reports go back to the port RTP packets come from, the server multiplexes RTCP on it (RFC 5761)
+        reception_stats = ReceptionStats()
+        rtcp_interval = self.config_parser.getfloat('Client', 'rtcp_interval', fallback=1.0)
+        next_report = time.monotonic() + rtcp_interval
+        server_addr = None
+        requested_rendition = None
         while not self.stream_stop_flag.is_set():
             try:
-                data, addr = self.rtp_socket.recvfrom(self.config_parser.getint('Client', 'rtp_buffer_size'))
-                if data:
-                    rtp_packet = RtpPacket()
-                    rtp_packet.decode(data)
-
-                    # End of stream
-                    if rtp_packet.payload == bytes(5):
-                        self.logger.debug("Stream has ended")
-                        self.stop_video()
-                        break
-
-                    self._update_image(rtp_packet.payload)
+                nbytes, addr = self.rtp_socket.recvfrom_into(rtp_buffer)
+                if nbytes:
+                    arrival = time.monotonic()
+                    rtp_packet.decode(rtp_buffer[:nbytes])
+                    reception_stats.update(rtp_packet, arrival)
+                    server_addr = addr
+
+                    frame = frame_assembler.push(rtp_packet)
+                    if frame is not None:
+                        # Latency is measured from the arrival of the whole frame
+                        self.jitter_buffer.put(rtp_packet.get_timestamp(), (arrival, frame))
             except TimeoutError:
                 # Stop listening upon requesting PAUSE or TEARDOWN
                 if self.stream_stop_flag.is_set():
@@ -436,17 +513,118 @@ class Client:
                         self.rtp_socket.close()
                     break
 
-    def _update_image(self, data: Optional[bytes] = None):
-        if data:
-            self.video_buffer = \
-                Image.open(io.BytesIO(data)).resize((self.canvas_width, self.canvas_height))
+            if rtcp_interval > 0 and server_addr and time.monotonic() >= next_report:
+                next_report = time.monotonic() + rtcp_interval
+                self._send_rtcp(reception_stats.report(), server_addr)
 
-        self.canvas_buffer = ImageTk.PhotoImage(self.video_buffer)
-        self.canvas_image_queue.put(
-            self.video_canvas.create_image(0, 0, anchor="nw", image=self.canvas_buffer))
+            # The rendition is switched by the server, on the next frame
+            wanted_rendition = self.wanted_rendition
+            if wanted_rendition and wanted_rendition != requested_rendition and server_addr:
+                self.logger.debug(f"Requesting {wanted_rendition} rendition")
+                self._send_rtcp(AppPacket(reception_stats.ssrc, RENDITION_REQUEST, wanted_rendition.encode("ascii")),
+                                server_addr)
+                requested_rendition = wanted_rendition
 
-        if self.canvas_image_queue.qsize() > 5:
-            self.video_canvas.delete(self.canvas_image_queue.get())
+    def _send_rtcp(self, packet, server_addr: Tuple) -> None:
+        try:
+            self.rtp_socket.sendto(packet.encode(), server_addr)
+        except OSError as err:
+            self.logger.debug(f"Failed to send RTCP packet: {err}")
+
+    def play_frames(self):
+        """Queue frames for decoding as the jitter buffer releases them on its playout clock."""
+        jitter_buffer = self.jitter_buffer
+        self.decode_queue.clear()
+        self.render_queue.clear()
+        self.last_rendered_frame = -1
+        self.playback_stats = PlaybackStats()
+
+        frame_index = 0
+        while not self.stream_stop_flag.is_set():
+            item = jitter_buffer.get(timeout=0.5)
+            if item is None:
+                continue
+
+            arrival, frame = item
+            # End of stream
+            if frame == bytes(5):
+                self.logger.debug("Stream has ended")
+                self.stop_video()
+                break
+
+            # Frames are numbered, so that those decoded out of order by the workers can be skipped
+            self.decode_queue.put((frame_index, arrival, frame))
+            frame_index += 1
+
+        self.logger.debug(f"Jitter buffer: {jitter_buffer.underruns} underruns, "
+                          f"{jitter_buffer.late_frames} late frames dropped")
+        self.logger.debug(f"Frames dropped before decoding: {self.decode_queue.dropped}, "
+                          f"before rendering: {self.render_queue.dropped}, "
+                          f"stale: {self.playback_stats.frames_dropped}")
+
+    def decode_frames(self):
+        """Decode and scale frames to the canvas size, off the receive thread and the Tk main loop."""
+        while not self.stream_stop_flag.is_set():
+            item = self.decode_queue.get(timeout=0.5)
+            if item is None:
+                continue
+
+            frame_index, arrival, frame = item
+            # Skip frames that would be shown too late, as long as a newer one is waiting
+            if self.decode_queue.qsize() and \
+                    self.playback_stats.is_stale(time.monotonic() - arrival, self.max_latency):
+                self.playback_stats.record_drop()
+                continue
+
+            start = time.monotonic()
+            try:
+                image = decode_frame(frame, (self.canvas_width, self.canvas_height), self.resampling)
+            except (OSError, ValueError) as err:
+                self.logger.debug(f"Failed to decode frame: {err}")
+                continue
+            self.playback_stats.record_decode(time.monotonic() - start)
+            self.render_queue.put((frame_index, arrival, image))
+
+    def _render_frames(self):
+        """Show the newest decoded frame, polled from the Tk main loop."""
+        newest = None
+        superseded = -1
+        item = self.render_queue.get(timeout=0)
+        while item is not None:
+            if item[0] > self.last_rendered_frame and (newest is None or item[0] > newest[0]):
+                newest = item
+            superseded += 1
+            item = self.render_queue.get(timeout=0)
+
+        if newest is not None and not self.stream_stop_flag.is_set():
+            self.playback_stats.record_drop(superseded)
+
+            start = time.monotonic()
+            self.last_rendered_frame, arrival, self.video_buffer = newest
+            self._update_image()
+            now = time.monotonic()
+            self.playback_stats.record_render(now - start, now - arrival)
+
+        self.master.after(RENDER_POLL_INTERVAL, self._render_frames)
+
+    def _update_stats(self):
+        if self.current_state == ClientState.PLAYING:
+            dropped = self.playback_stats.frames_dropped + self.decode_queue.dropped + self.render_queue.dropped
+            self.stats_txt.set(f"Latency: {self.playback_stats.latency * 1000:.0f} ms, dropped: {dropped}")
+        self.master.after(STATS_UPDATE_INTERVAL, self._update_stats)
+
+    def _update_image(self):
+        if self.canvas_buffer is not None and \
+                (self.canvas_buffer.width(), self.canvas_buffer.height()) == self.video_buffer.size:
+            self.canvas_buffer.paste(self.video_buffer)
+            return
+
+        # The photo image only has to be recreated when the canvas is resized
+        self.canvas_buffer = ImageTk.PhotoImage(self.video_buffer)
+        if self.canvas_image is None:
+            self.canvas_image = self.video_canvas.create_image(0, 0, anchor="nw", image=self.canvas_buffer)
+        else:
+            self.video_canvas.itemconfigure(self.canvas_image, image=self.canvas_buffer)
 
 
 class SettingWindow(tk.Toplevel):
@@ -478,6 +656,27 @@ class SettingWindow(tk.Toplevel):
         self.rtp_buffer_size_entry: ttk.Entry = self._make_entry("RTP buffer size:")
         self.rtp_buffer_size_entry.insert(0, client_settings.getint("Client", "rtp_buffer_size"))
 
+        self.jitter_buffer_depth_entry: ttk.Entry = self._make_entry("Jitter buffer depth:")
+        self.jitter_buffer_depth_entry.insert(0, client_settings.getint("Client", "jitter_buffer_depth"))
+
+        self.decode_workers_entry: ttk.Entry = self._make_entry("Decode workers:")
+        self.decode_workers_entry.insert(0, client_settings.getint("Client", "decode_workers"))
+
+        self.max_latency_entry: ttk.Entry = self._make_entry("Max latency (s):")
+        self.max_latency_entry.insert(0, client_settings.getfloat("Client", "max_latency"))
+
+        self.resampling_entry: ttk.Combobox = self._make_entry("Resampling:", widget=ttk.Combobox,
+                                                               values=list(RESAMPLING_FILTERS), state="readonly")
+        self.resampling_entry.set(client_settings.get("Client", "resampling"))
+
+        self.transport_entry: ttk.Combobox = self._make_entry("Transport:", widget=ttk.Combobox,
+                                                              values=["unicast", "multicast"], state="readonly")
+        self.transport_entry.set(client_settings.get("Client", "transport"))
+
+        self.rendition_entry: ttk.Combobox = self._make_entry("Rendition:", widget=ttk.Combobox,
+                                                              values=["auto"] + list(RENDITIONS), state="readonly")
+        self.rendition_entry.set(client_settings.get("Client", "rendition"))
+
         button_container = ttk.Frame(self)
         button_container.pack(side=tk.BOTTOM, fill=tk.X, padx=8, pady=8)
 
@@ -494,6 +693,12 @@ class SettingWindow(tk.Toplevel):
         self.client_settings.set("Connection", "delay_between_retry", self.delay_between_retry_entry.get())
         self.client_settings.set("Client", "rtsp_buffer_size", self.rtsp_buffer_size_entry.get())
         self.client_settings.set("Client", "rtp_buffer_size", self.rtp_buffer_size_entry.get())
+        self.client_settings.set("Client", "jitter_buffer_depth", self.jitter_buffer_depth_entry.get())
+        self.client_settings.set("Client", "decode_workers", self.decode_workers_entry.get())
+        self.client_settings.set("Client", "max_latency", self.max_latency_entry.get())
+        self.client_settings.set("Client", "resampling", self.resampling_entry.get())
+        self.client_settings.set("Client", "transport", self.transport_entry.get())
+        self.client_settings.set("Client", "rendition", self.rendition_entry.get())
 
         with open("config/client.cfg", 'w') as config_file:
             self.client_settings.write(config_file)
@@ -503,13 +708,13 @@ class SettingWindow(tk.Toplevel):
         self.client.master.after(100, self.client.reconnect_to_server)
         self.destroy()
 
-    def _make_entry(self, caption: str, **options) -> ttk.Entry:
+    def _make_entry(self, caption: str, widget=ttk.Entry, **options) -> ttk.Entry:
         entry_container = ttk.Frame(self)
         entry_container.pack(side=tk.TOP, fill=tk.X, padx=8, pady=8)
 
         ttk.Label(entry_container, text=caption).pack(side=tk.LEFT)
 
-        entry = ttk.Entry(entry_container, **options)
+        entry = widget(entry_container, **options)
         entry.pack(side=tk.RIGHT)
         return entry
 
@@ -1,5 +1,20 @@
+import errno
+import functools
+import io
+import random
+import socket
+import threading
+from collections import deque
 from enum import Enum
-from typing import List
+from queue import SimpleQueue
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from PIL import Image
+
+from rtcp_packet import ReceiverReport
+from rtp_packet import RtpPacket, JPEG_HEADER_SIZE, decode_jpeg_header
+from rtp_sender import MEDIA_CLOCK_RATE
+from rtsp_parser import MAX_RESPONSE_SIZE, RtspFramer, RtspParseError
 
 
 class ServerDisconnected(Exception):
@@ -24,6 +39,14 @@ class RtspResponse:
         else:
             return 0
 
+    def get_header(self, name: str) -> Optional[str]:
+        """Return the value of a header field, `name` is case-insensitive."""
+        for line in self.line[1:]:
+            field, _, value = line.partition(':')
+            if field.strip().lower() == name.lower():
+                return value.strip()
+        return None
+
     def get_other_line(self) -> List[str]:
         external_field_index = 2
         if self.line[2].startswith("Session:"):
@@ -37,3 +60,289 @@ class ClientState(Enum):
     INIT = 0
     READY = 1
     PLAYING = 2
+
+
+class FrameAssembler:
+    """Reassemble JPEG frames from RTP fragments (RFC 2435)."""
+
+    def __init__(self):
+        self.buffer: bytearray = bytearray()
+        self.timestamp: Optional[int] = None
+        self.next_seq_num: Optional[int] = None
+        self.is_valid: bool = False
+
+    def push(self, packet: RtpPacket) -> Optional[bytes]:
+        """Add a fragment, return the frame once its last fragment has arrived."""
+        payload = packet.get_payload()
+        fragment_offset, _, _ = decode_jpeg_header(payload)
+        fragment = payload[JPEG_HEADER_SIZE:]
+
+        if fragment_offset == 0:
+            self.buffer = bytearray(fragment)
+            self.timestamp = packet.get_timestamp()
+            self.is_valid = True
+        elif self.is_valid and packet.get_seq_num() == self.next_seq_num \
+                and packet.get_timestamp() == self.timestamp and fragment_offset == len(self.buffer):
+            self.buffer += fragment
+        else:
+            # A fragment has been lost or reordered, drop the whole frame
+            self.is_valid = False
+        self.next_seq_num = (packet.get_seq_num() + 1) & 0xffff
+
+        if packet.get_marker() and self.is_valid:
+            self.is_valid = False
+            return bytes(self.buffer)
+        return None
+
+
+class DropOldestQueue:
+    """
+    Bounded FIFO queue between pipeline stages.
+
+    Putting into a full queue drops its oldest item rather than blocking, so a slow
+    consumer never stalls the producer and always gets the most recent items.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize: int = maxsize
+        self.dropped: int = 0
+
+        self._items: Deque = deque()
+        self._condition = threading.Condition()
+
+    def put(self, item) -> None:
+        with self._condition:
+            if len(self._items) >= self.maxsize:
+                self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self._condition.notify()
+
+    def get(self, timeout: Optional[float] = None):
+        """Return the oldest item, or None if none arrives within `timeout` seconds."""
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._items, timeout):
+                return None
+            return self._items.popleft()
+
+    def qsize(self) -> int:
+        with self._condition:
+            return len(self._items)
+
+    def clear(self) -> None:
+        with self._condition:
+            self._items.clear()
+
+
+RESAMPLING_FILTERS = {
+    'nearest': Image.NEAREST,
+    'bilinear': Image.BILINEAR,
+    'bicubic': Image.BICUBIC,
+    'lanczos': Image.LANCZOS,
+}
+
+
+def decode_frame(data: bytes, size: Tuple[int, int], resample: int = Image.BILINEAR) -> Image.Image:
+    """
+    Decode a JPEG frame scaled to `size`.
+
+    The JPEG decoder's draft mode decodes at the smallest 1/2, 1/4 or 1/8 scale that still
+    covers `size`, so only that much smaller image is resized.
+    """
+    image = Image.open(io.BytesIO(data))
+    image.draft('RGB', size)
+    return image.resize(size, resample)
+
+
+class PlaybackStats:
+    """
+    Per-frame costs and latency of the client, as exponential moving averages.
+
+    Latency is measured from the arrival of a frame's last fragment to its rendering.
+    A frame is stale if, once decoded and rendered, it would be shown later than the
+    maximum latency.
+    """
+
+    SMOOTHING = 0.1
+
+    def __init__(self):
+        self.decode_time: float = 0.0
+        self.render_time: float = 0.0
+        self.latency: float = 0.0
+        self.frames_dropped: int = 0
+
+        self._lock = threading.Lock()
+
+    def record_decode(self, seconds: float) -> None:
+        with self._lock:
+            self.decode_time += self.SMOOTHING * (seconds - self.decode_time)
+
+    def record_render(self, seconds: float, latency: float) -> None:
+        with self._lock:
+            self.render_time += self.SMOOTHING * (seconds - self.render_time)
+            self.latency += self.SMOOTHING * (latency - self.latency)
+
+    def record_drop(self, count: int = 1) -> None:
+        with self._lock:
+            self.frames_dropped += count
+
+    def is_stale(self, age: float, max_latency: float) -> bool:
+        """Return whether a frame received `age` seconds ago would exceed `max_latency` when shown."""
+        return age + self.decode_time + self.render_time > max_latency
+
+
+class ReceptionStats:
+    """
+    Reception statistics of an RTP stream, reported to its sender in RTCP receiver reports.
+
+    Sequence numbers are extended across wrap-arounds and the interarrival jitter is
+    estimated following RFC 3550 A.1, A.3 and A.8. Statistics restart when the source changes.
+    """
+
+    def __init__(self, clock_rate: int = MEDIA_CLOCK_RATE):
+        self.clock_rate: int = clock_rate
+        self.ssrc: int = random.getrandbits(32)
+        self._reset(None, 0)
+
+    def update(self, packet: RtpPacket, arrival: float) -> None:
+        """Account for a packet received at `arrival` seconds."""
+        seq_num = packet.get_seq_num()
+        if packet.get_ssrc() != self.source_ssrc:
+            self._reset(packet.get_ssrc(), seq_num)
+        else:
+            # Late or duplicated packets don't move the highest sequence number back
+            delta = (seq_num - self.max_seq_num) & 0xffff
+            if 0 < delta < 0x8000:
+                if seq_num < self.max_seq_num:
+                    self.cycles += 1 << 16
+                self.max_seq_num = seq_num
+        self.received += 1
+
+        # Transit times are in timestamp units, only their differences matter
+        transit = (int(arrival * self.clock_rate) - packet.get_timestamp()) & 0xffffffff
+        if self._transit is not None:
+            difference = (transit - self._transit) & 0xffffffff
+            difference = min(difference, (1 << 32) - difference)
+            self.jitter += (difference - self.jitter) / 16
+        self._transit = transit
+
+    def extended_max_seq_num(self) -> int:
+        return self.cycles + self.max_seq_num
+
+    def report(self) -> Optional[ReceiverReport]:
+        """Return a receiver report about the packets received so far, None before the first one."""
+        if self.source_ssrc is None:
+            return None
+
+        expected = self.extended_max_seq_num() - self.base_seq_num + 1
+        expected_interval = expected - self._expected_prior
+        lost_interval = expected_interval - (self.received - self._received_prior)
+        self._expected_prior = expected
+        self._received_prior = self.received
+
+        fraction_lost = lost_interval / expected_interval if expected_interval > 0 and lost_interval > 0 else 0.0
+        return ReceiverReport(self.ssrc, self.source_ssrc, fraction_lost, expected - self.received,
+                              self.extended_max_seq_num(), int(self.jitter))
+
+    def _reset(self, source_ssrc: Optional[int], seq_num: int) -> None:
+        self.source_ssrc: Optional[int] = source_ssrc
+        self.base_seq_num: int = seq_num
+        self.max_seq_num: int = seq_num
+        self.cycles: int = 0
+        self.received: int = 0
+        self.jitter: float = 0.0
+        self._transit: Optional[int] = None
+
+        # Counts at the previous report, to compute the fraction lost in between
+        self._expected_prior: int = 0
+        self._received_prior: int = 0
+
+
+class RtspChannel:
+    """
+    RTSP connection of the client, read by a background thread.
+
+    Requests are sent without waiting for the responses to the previous ones. Responses are
+    matched to their request by CSeq, and their callbacks are queued to be run by `dispatch`,
+    so that they are called from the Tk main loop. If the server disconnects, `on_disconnect`
+    is queued instead and the pending requests are dropped.
+    """
+
+    def __init__(self, connection: socket.socket, buffer_size: int, on_disconnect: Callable[[], None]):
+        self.connection: socket.socket = connection
+        self.buffer_size: int = buffer_size
+        self.on_disconnect: Callable[[], None] = on_disconnect
+
+        self._pending: Dict[int, Callable[[RtspResponse], None]] = {}
+        self._callbacks: SimpleQueue = SimpleQueue()
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+
+        threading.Thread(target=self._receive, daemon=True).start()
+
+    def send(self, sequence_number: int, request: str, callback: Callable[[RtspResponse], None]) -> None:
+        """Send a request, `callback` is later dispatched with its response."""
+        with self._lock:
+            self._pending[sequence_number] = callback
+            try:
+                # A blank line ends the request
+                self.connection.sendall((request + "\n").encode("utf-8"))
+            except OSError:
+                self._disconnected()
+
+    def pending(self) -> int:
+        """Return the number of requests waiting for their response."""
+        with self._lock:
+            return len(self._pending)
+
+    def dispatch(self) -> None:
+        """Run the callbacks of the responses received so far."""
+        while not self._callbacks.empty():
+            self._callbacks.get()()
+
+    def close(self) -> None:
+        self._closed.set()
+        try:
+            self.connection.shutdown(socket.SHUT_RDWR)
+            self.connection.close()
+        except OSError as err:
+            if err.errno != errno.ENOTCONN:
+                raise err
+
+    def _receive(self) -> None:
+        framer = RtspFramer(MAX_RESPONSE_SIZE)
+        while not self._closed.is_set():
+            try:
+                data = self.connection.recv(self.buffer_size)
+            except TimeoutError:
+                continue
+            except OSError:
+                data = b""
+
+            try:
+                messages = framer.feed(data) if data else None
+            except RtspParseError:
+                messages = None
+            if messages is None:
+                with self._lock:
+                    self._disconnected()
+                return
+
+            for message in messages:
+                try:
+                    response = RtspResponse(message.decode("utf-8"))
+                except (UnicodeDecodeError, ValueError, IndexError):
+                    # Not a response to any request
+                    continue
+                with self._lock:
+                    callback = self._pending.pop(response.sequence_number, None)
+                if callback:
+                    self._callbacks.put(functools.partial(callback, response))
+
+    def _disconnected(self) -> None:
+        # Called with the lock held, only the first failure is reported
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._pending.clear()
+        self._callbacks.put(self.on_disconnect)
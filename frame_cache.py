@@ -0,0 +1,65 @@
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable
+
+
+class FrameCache:
+    """
+    Process-wide LRU cache of video frames, shared by all streaming sessions.
+
+    Frames are keyed by (file, frame number) and evicted in least-recently-used
+    order once their total size exceeds `max_bytes`.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes: int = max_bytes
+        self.current_bytes: int = 0
+
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+
+        self._frames: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, loader: Callable[[], bytes]) -> bytes:
+        """Return the cached frame for `key`, loading and caching it with `loader` on a miss."""
+        with self._lock:
+            data = self._frames.get(key)
+            if data is not None:
+                self._frames.move_to_end(key)
+                self.hits += 1
+                return data
+            self.misses += 1
+
+        # Load outside the lock, so a slow disk read doesn't block other sessions
+        data = bytes(loader())
+        if len(data) > self.max_bytes:
+            return data
+
+        with self._lock:
+            if key not in self._frames:
+                self._frames[key] = data
+                self.current_bytes += len(data)
+
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._frames.popitem(last=False)
+                self.current_bytes -= len(evicted)
+                self.evictions += 1
+        return data
+
+    def stats(self) -> Dict[str, int]:
+        """Return the cache counters."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "frames": len(self._frames),
+                "bytes": self.current_bytes,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._frames.clear()
+            self.current_bytes = 0
@@ -0,0 +1,94 @@
+import heapq
+import threading
+import time
+from typing import Any, List, Optional
+
+from rtp_sender import MEDIA_CLOCK_RATE
+
+
+class JitterBuffer:
+    """
+    Reorder received frames and release them on a steady playout clock.
+
+    Frames are ordered by RTP timestamp. Playout starts once `target_depth` frames are
+    buffered, then each frame is released when the time elapsed since the first one
+    matches its timestamp. Frames arriving after a later frame has been played are dropped,
+    and running out of frames counts as an underrun and buffers `target_depth` frames again.
+    """
+
+    def __init__(self, target_depth: int = 3, clock_rate: int = MEDIA_CLOCK_RATE):
+        self.target_depth: int = target_depth
+        self.clock_rate: int = clock_rate
+
+        self.underruns: int = 0
+        self.late_frames: int = 0
+
+        self._frames: List = []
+        self._condition = threading.Condition()
+        self._last_timestamp: Optional[int] = None
+        self._last_played: Optional[int] = None
+
+        # Playout clock, set whenever playout (re)starts
+        self._is_playing: bool = False
+        self._base_timestamp: int = 0
+        self._base_time: float = 0.0
+
+    def put(self, timestamp: int, frame: Any) -> None:
+        """Add a frame, or any item carrying it, with its 32-bit RTP timestamp."""
+        with self._condition:
+            timestamp = self._unwrap(timestamp)
+            if self._last_played is not None and timestamp <= self._last_played:
+                self.late_frames += 1
+                return
+
+            heapq.heappush(self._frames, (timestamp, frame))
+            self._condition.notify()
+
+    def get(self, timeout: Optional[float] = None) -> Any:
+        """Wait for the next frame to be due and return it, or None after `timeout` seconds."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while True:
+                if not self._is_playing and len(self._frames) >= self.target_depth:
+                    self._is_playing = True
+                    self._base_timestamp = self._frames[0][0]
+                    self._base_time = time.monotonic()
+
+                wait_until = deadline
+                if self._is_playing:
+                    if not self._frames:
+                        self.underruns += 1
+                        self._is_playing = False
+                        continue
+
+                    timestamp, frame = self._frames[0]
+                    due = self._base_time + (timestamp - self._base_timestamp) / self.clock_rate
+                    if due <= time.monotonic():
+                        heapq.heappop(self._frames)
+                        self._last_played = timestamp
+                        return frame
+                    wait_until = due if deadline is None else min(due, deadline)
+
+                if deadline is not None and time.monotonic() >= deadline:
+                    return None
+                self._condition.wait(None if wait_until is None else max(wait_until - time.monotonic(), 0))
+
+    def occupancy(self) -> int:
+        """Return the number of buffered frames."""
+        with self._condition:
+            return len(self._frames)
+
+    def clear(self) -> None:
+        with self._condition:
+            self._frames.clear()
+            self._is_playing = False
+
+    def _unwrap(self, timestamp: int) -> int:
+        # Extend 32-bit timestamps, so ordering survives their wrap around
+        if self._last_timestamp is not None:
+            delta = (timestamp - self._last_timestamp) & 0xffffffff
+            if delta >= 1 << 31:
+                delta -= 1 << 32
+            timestamp = self._last_timestamp + delta
+        self._last_timestamp = timestamp
+        return timestamp
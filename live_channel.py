@@ -0,0 +1,222 @@
+import logging
+import pathlib
+import socket
+import threading
+from typing import Dict, Optional, Tuple, Union
+
+from frame_cache import FrameCache
+from pacing import PacingScheduler
+from renditions import FULL, TranscodedStream, scaled_size
+from rtp_sender import RtpSender, send_datagrams
+from video_stream import VideoStream
+
+
+class LiveChannel:
+    """
+    Broadcast of a video to every subscribed session, in sync.
+
+    Frames are read and packetized once per channel, then the packets are sent to every
+    subscriber, with only the sequence numbers, timestamp and SSRC of their headers
+    restamped for its stream. The video loops, sessions joining at any time see the same
+    frames as the others.
+
+    With a `multicast_address`, multicast subscribers all share the channel's own stream,
+    sent once to the group whatever their number.
+
+    Unicast subscribers may switch to a lower rendition of the video, read in sync with the
+    full one and packetized once per frame for all the subscribers watching it.
+
+    The channel is paced by the scheduler like a session.
+    """
+
+    def __init__(self, video_file: pathlib.Path, frame_rate: float, frame_size: Tuple[int, int],
+                 max_packet_size: int, use_mmap: bool = False, frame_cache: Optional[FrameCache] = None,
+                 multicast_address: Optional[Tuple[str, int]] = None, multicast_ttl: int = 1,
+                 multicast_interface: str = "0.0.0.0"):
+        self.stream_handler: VideoStream = VideoStream(video_file, use_mmap, frame_cache)
+        self.rtp_sender: RtpSender = RtpSender(frame_rate, frame_size, max_packet_size)
+        self.max_packet_size: int = max_packet_size
+        self.use_mmap: bool = use_mmap
+        self.frame_cache: Optional[FrameCache] = frame_cache
+        # Streams and senders of the lower renditions subscribers have switched to
+        self._renditions: Dict[str, Tuple[Union[VideoStream, TranscodedStream], RtpSender]] = {}
+        self.frame_interval: float = 1 / frame_rate
+        # Frames are numbered continuously across loops, so timestamps keep increasing
+        self.frame_nbr: int = 0
+
+        # Identify the channel in scheduler stats
+        self.client_addr: Tuple[str, str] = ("channel", video_file.name)
+        self.last_lateness: float = 0.0
+        self.max_lateness: float = 0.0
+        self.late_frames: int = 0
+
+        self.multicast_address: Optional[Tuple[str, int]] = multicast_address
+        self.multicast_socket: Optional[socket.socket] = None
+        if multicast_address:
+            self.multicast_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.multicast_socket.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, multicast_ttl)
+            self.multicast_socket.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF,
+                                             socket.inet_aton(multicast_interface))
+
+        self._subscribers: Dict[int, object] = {}
+        self._multicast_subscribers: Dict[int, object] = {}
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(f"streaming-app.server.channel-{video_file.name}")
+
+    def add(self, session, multicast: bool = False) -> None:
+        with self._lock:
+            if multicast:
+                self._multicast_subscribers[id(session)] = session
+            else:
+                self._subscribers[id(session)] = session
+
+    def remove(self, session) -> bool:
+        """Unsubscribe a session, return whether the channel has no subscribers left."""
+        with self._lock:
+            self._subscribers.pop(id(session), None)
+            self._multicast_subscribers.pop(id(session), None)
+            return not self._subscribers and not self._multicast_subscribers
+
+    def send_next_frame(self) -> None:
+        """Read and packetize the next frame once, then send it to every subscriber."""
+        frame = self.stream_handler.next_frame()
+        if not frame:
+            self.stream_handler.seek_frame(0)
+            frame = self.stream_handler.next_frame()
+        frame_index = self.stream_handler.frame_nbr() - 1
+
+        packets = self.rtp_sender.packetize(frame, self.frame_nbr)
+        with self._lock:
+            subscribers = list(self._subscribers.values())
+            multicast = bool(self._multicast_subscribers)
+
+        # Multicast packets keep the channel's headers, they are sent before being restamped
+        if multicast:
+            try:
+                send_datagrams(self.multicast_socket, packets, self.multicast_address)
+            except OSError as err:
+                self.logger.debug(f"Failed to send multicast RTP packet: {err}")
+
+        rendition_packets = {FULL: packets}
+        for session in subscribers:
+            # Frames are thinned for each congested receiver
+            if session.rate_adapter.skips(self.frame_nbr):
+                continue
+
+            rendition = self._rendition_of(session)
+            packets = rendition_packets.get(rendition)
+            if packets is None:
+                stream_handler, rtp_sender = self._renditions[rendition]
+                packets = rtp_sender.packetize(stream_handler.frame_at(frame_index), self.frame_nbr)
+                rendition_packets[rendition] = packets
+
+            session.rtp_sender.restamp(packets, self.frame_nbr)
+            try:
+                session.send_rtp(packets)
+            except OSError as err:
+                session.logger.debug(f"Failed to send RTP packet: {err}")
+        self.frame_nbr += 1
+
+    def _rendition_of(self, session) -> str:
+        # Subscribers switch renditions between frames, once the requested one can be opened
+        if session.requested_rendition != session.rendition and self._open_rendition(session):
+            session.rendition = session.requested_rendition
+            session.logger.debug(f"Switched to {session.rendition} rendition")
+        return session.rendition
+
+    def _open_rendition(self, session) -> bool:
+        rendition = session.requested_rendition
+        if rendition == FULL or rendition in self._renditions:
+            return True
+
+        try:
+            stream_handler = session.catalog.open_rendition(session.filename, rendition, self.use_mmap,
+                                                            self.frame_cache)
+        except IOError:
+            return False
+        if stream_handler is None:
+            return False
+        if stream_handler.frame_count() != self.stream_handler.frame_count():
+            self.logger.warning(f"Frames of the {rendition} rendition don't match the video")
+            session.requested_rendition = session.rendition
+            return False
+
+        rtp_sender = RtpSender(self.rtp_sender.frame_rate, scaled_size(self.rtp_sender.frame_size, rendition),
+                               self.max_packet_size)
+        self._renditions[rendition] = (stream_handler, rtp_sender)
+        return True
+
+    def report_lateness(self, lateness: float) -> None:
+        self.last_lateness = lateness
+        self.max_lateness = max(self.max_lateness, lateness)
+        if lateness > self.frame_interval:
+            if self.late_frames % 100 == 0:
+                self.logger.warning(f"Frame sent {lateness * 1000:.1f}ms late, server may be overloaded")
+            self.late_frames += 1
+
+
+class ChannelRegistry:
+    """
+    Live channels of the videos being watched, created along with their first subscriber
+    and removed along with their last one.
+
+    With a `multicast_group`, each video is given its own port of the group, from
+    `multicast_port` on, which is kept for the lifetime of the registry.
+    """
+
+    def __init__(self, scheduler: PacingScheduler, multicast_group: Optional[str] = None, multicast_port: int = 5004,
+                 multicast_ttl: int = 1, multicast_interface: str = "0.0.0.0"):
+        self.scheduler: PacingScheduler = scheduler
+        self.multicast_group: Optional[str] = multicast_group
+        self.multicast_port: int = multicast_port
+        self.multicast_ttl: int = multicast_ttl
+        self.multicast_interface: str = multicast_interface
+
+        self._channels: Dict[str, LiveChannel] = {}
+        self._multicast_ports: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger("streaming-app.server.channels")
+
+    def multicast_address(self, filename: str) -> Optional[Tuple[str, int]]:
+        """Return the group address and port the live channel of `filename` is multicast to, if enabled."""
+        if not self.multicast_group:
+            return None
+        with self._lock:
+            return self._multicast_address(filename)
+
+    def subscribe(self, filename: str, session, multicast: bool = False) -> None:
+        """Start sending the live channel of `filename` to a set up session, or to its group."""
+        with self._lock:
+            channel = self._channels.get(filename)
+            if channel is None:
+                # The channel streams with the parameters of the session which started it
+                channel = LiveChannel(session.video_path / filename, session.rtp_sender.frame_rate,
+                                      session.rtp_sender.frame_size, session.max_packet_size,
+                                      session.use_mmap, session.frame_cache,
+                                      self._multicast_address(filename) if self.multicast_group else None,
+                                      self.multicast_ttl, self.multicast_interface)
+                self._channels[filename] = channel
+                self.scheduler.add(channel, channel.frame_interval)
+                self.logger.debug(f"Started channel {filename}")
+            channel.add(session, multicast)
+
+    def unsubscribe(self, filename: str, session) -> None:
+        """Stop sending a live channel to a session, if it was subscribed."""
+        with self._lock:
+            channel = self._channels.get(filename)
+            if channel is None or not channel.remove(session):
+                return
+
+            # The scheduler may still be sending a frame, the video is closed once the channel is released
+            self.scheduler.remove(channel)
+            del self._channels[filename]
+            self.logger.debug(f"Stopped channel {filename}")
+
+    def channel_count(self) -> int:
+        with self._lock:
+            return len(self._channels)
+
+    def _multicast_address(self, filename: str) -> Tuple[str, int]:
+        # RTP ports are even, the odd ones are left for RTCP (RFC 3550)
+        port = self._multicast_ports.setdefault(filename, self.multicast_port + 2 * len(self._multicast_ports))
+        return self.multicast_group, port
@@ -0,0 +1,104 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from typing import Dict, List, Optional
+
+
+class PacingEntry:
+    """Scheduling state of a playing session."""
+
+    def __init__(self, session, frame_interval: float, deadline: float):
+        self.session = session
+        self.frame_interval: float = frame_interval
+        self.deadline: float = deadline
+        self.cancelled: bool = False
+
+
+class PacingScheduler(threading.Thread):
+    """
+    Send frames of every playing session from a single thread.
+
+    Sessions are kept in a heap keyed by their next deadline on the monotonic clock.
+    Deadlines advance by exactly one frame interval, so processing time doesn't add up
+    into drift, and how late each frame is sent is reported to its session.
+    """
+
+    # A session further behind than this is re-synchronised instead of sending a burst of frames
+    MAX_CATCH_UP = 1.0
+
+    def __init__(self):
+        super(PacingScheduler, self).__init__(daemon=True)
+        self._heap: List = []
+        self._entries: Dict[int, PacingEntry] = {}
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+
+        self.logger = logging.getLogger("streaming-app.server.pacing")
+
+    def add(self, session, frame_interval: float) -> None:
+        """Start sending frames of `session` every `frame_interval` seconds."""
+        with self._condition:
+            self._cancel(session)
+
+            entry = PacingEntry(session, frame_interval, time.monotonic() + frame_interval)
+            self._entries[id(session)] = entry
+            heapq.heappush(self._heap, (entry.deadline, next(self._counter), entry))
+            self._condition.notify()
+
+    def remove(self, session) -> None:
+        """Stop sending frames of `session`."""
+        with self._condition:
+            self._cancel(session)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Return how late the frames of each playing session are sent, in seconds."""
+        with self._condition:
+            return {f"{entry.session.client_addr[0]}:{entry.session.client_addr[1]}": {
+                "last_lateness": entry.session.last_lateness,
+                "max_lateness": entry.session.max_lateness,
+                "late_frames": entry.session.late_frames,
+            } for entry in self._entries.values()}
+
+    def run(self) -> None:
+        while True:
+            entry = self._wait_next()
+
+            lateness = time.monotonic() - entry.deadline
+            try:
+                entry.session.send_next_frame()
+            except Exception as err:
+                self.logger.exception(err)
+                self.remove(entry.session)
+                continue
+            entry.session.report_lateness(lateness)
+
+            with self._condition:
+                if entry.cancelled:
+                    continue
+
+                entry.deadline += entry.frame_interval
+                if time.monotonic() - entry.deadline > self.MAX_CATCH_UP:
+                    entry.deadline = time.monotonic() + entry.frame_interval
+                heapq.heappush(self._heap, (entry.deadline, next(self._counter), entry))
+
+    def _wait_next(self) -> PacingEntry:
+        """Pop the entry with the earliest deadline, once it is due."""
+        with self._condition:
+            while True:
+                # Drop entries of sessions which have been removed
+                while self._heap and self._heap[0][2].cancelled:
+                    heapq.heappop(self._heap)
+
+                timeout: Optional[float] = None
+                if self._heap:
+                    timeout = self._heap[0][0] - time.monotonic()
+                    if timeout <= 0:
+                        return heapq.heappop(self._heap)[2]
+                self._condition.wait(timeout)
+
+    def _cancel(self, session) -> None:
+        entry = self._entries.pop(id(session), None)
+        if entry:
+            entry.cancelled = True
@@ -0,0 +1,45 @@
+from rtcp_packet import ReceiverReport
+from rtp_sender import MEDIA_CLOCK_RATE
+
+
+class FrameRateAdapter:
+    """
+    Thin the frame rate of a stream from the receiver reports of its client.
+
+    Only every `frame_step`-th frame is sent. A report showing congestion, more packets lost
+    than `loss_threshold` or more interarrival jitter than `jitter_threshold` seconds, doubles
+    the step up to `max_frame_step`. It then goes back down by one after `recovery_reports`
+    clean reports in a row, so the rate backs off quickly and probes back slowly.
+
+    With a `max_frame_step` of 1, every frame is always sent.
+    """
+
+    def __init__(self, max_frame_step: int = 4, loss_threshold: float = 0.05, jitter_threshold: float = 0.05,
+                 recovery_reports: int = 3):
+        self.max_frame_step: int = max_frame_step
+        self.loss_threshold: float = loss_threshold
+        self.jitter_threshold: int = int(jitter_threshold * MEDIA_CLOCK_RATE)
+        self.recovery_reports: int = recovery_reports
+
+        self.frame_step: int = 1
+        self._clean_reports: int = 0
+
+    def on_report(self, report: ReceiverReport) -> bool:
+        """Update the frame step from a receiver report, return whether it changed."""
+        if report.fraction_lost > self.loss_threshold or report.jitter > self.jitter_threshold:
+            self._clean_reports = 0
+            frame_step = min(self.frame_step * 2, self.max_frame_step)
+        else:
+            self._clean_reports += 1
+            if self._clean_reports < self.recovery_reports:
+                return False
+            self._clean_reports = 0
+            frame_step = max(self.frame_step - 1, 1)
+
+        changed = frame_step != self.frame_step
+        self.frame_step = frame_step
+        return changed
+
+    def skips(self, frame_nbr: int) -> bool:
+        """Return whether frame `frame_nbr` should not be sent."""
+        return frame_nbr % self.frame_step != 0
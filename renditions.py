@@ -0,0 +1,141 @@
+import array
+import io
+import os
+import pathlib
+from typing import Dict, Iterable, Iterator, Optional, Tuple, Union
+
+from PIL import Image
+
+from frame_cache import FrameCache
+from transcode_cache import TranscodeCache
+from video_stream import FRAME_LENGTH_SIZE, VideoStream, build_frame_index, load_frame_index, write_atomically, \
+    write_frame_index
+
+FULL = "full"
+
+# Quality ladder, rendition name to scale divisor and JPEG quality, the full rendition is the video itself
+RENDITIONS: Dict[str, Tuple[int, int]] = {
+    FULL: (1, 0),
+    'half': (2, 80),
+    'quarter': (4, 70),
+}
+
+# Renditions are kept in a hidden folder, so they are not listed as videos of their own
+RENDITION_FOLDER = ".renditions"
+
+
+def rendition_path(video_file: pathlib.Path, rendition: str) -> pathlib.Path:
+    """Return the file of a rendition of a video, e.g. `.renditions/movie.half.mjpeg`."""
+    if rendition == FULL:
+        return video_file
+    return video_file.parent / RENDITION_FOLDER / f"{video_file.stem}.{rendition}{video_file.suffix}"
+
+
+def rendition_is_current(video_file: pathlib.Path, rendition: str) -> bool:
+    """Return whether a rendition has been generated since the video was last modified."""
+    try:
+        return rendition_path(video_file, rendition).stat().st_mtime_ns >= video_file.stat().st_mtime_ns
+    except OSError:
+        return False
+
+
+def scaled_size(frame_size: Tuple[int, int], rendition: str) -> Tuple[int, int]:
+    scale = RENDITIONS[rendition][0]
+    return frame_size[0] // scale, frame_size[1] // scale
+
+
+def transcode_frame(frame: Union[bytes, memoryview], rendition: str) -> bytes:
+    """Downscale a JPEG frame and encode it again with the quality of `rendition`."""
+    image = Image.open(io.BytesIO(frame))
+    width, height = scaled_size(image.size, rendition)
+    size = (max(width, 1), max(height, 1))
+
+    # The decoder scales by 1/2, 1/4 or 1/8 on its own, far cheaper than decoding the full frame
+    image.draft('RGB', size)
+    if image.size != size:
+        image = image.resize(size, Image.BILINEAR)
+
+    output = io.BytesIO()
+    image.convert('RGB').save(output, format='JPEG', quality=RENDITIONS[rendition][1])
+    return output.getvalue()
+
+
+def generate_rendition(filename, rendition: str) -> pathlib.Path:
+    """Transcode every frame of a video into a rendition file, along with its frame index, and return its path."""
+    video_file = pathlib.Path(filename)
+    output_path = rendition_path(video_file, rendition)
+    output_path.parent.mkdir(exist_ok=True)
+
+    index = array.array('Q')
+    write_atomically(output_path, _transcode_frames(video_file, rendition, index))
+    write_frame_index(output_path, index)
+    return output_path
+
+
+def _transcode_frames(video_file: pathlib.Path, rendition: str, index: array.array) -> Iterator[bytes]:
+    # Yield the transcoded frames with their length prefix, filling the index of the rendition along the way
+    source_index = load_frame_index(video_file) or build_frame_index(video_file)
+    offset = 0
+    with open(video_file, 'rb') as file:
+        for frame_nbr in range(len(source_index) // 2):
+            file.seek(source_index[2 * frame_nbr])
+            frame = transcode_frame(file.read(source_index[2 * frame_nbr + 1]), rendition)
+
+            index.append(offset + FRAME_LENGTH_SIZE)
+            index.append(len(frame))
+            offset += FRAME_LENGTH_SIZE + len(frame)
+            yield f"{len(frame):0{FRAME_LENGTH_SIZE}d}".encode()
+            yield frame
+
+
+class TranscodedStream:
+    """
+    Rendition of a video transcoded frame by frame as it is read, through `cache`, while the
+    rendition file is not generated yet. Reads like a `VideoStream` of that file.
+    """
+
+    def __init__(self, video_file, rendition: str, cache: TranscodeCache, use_mmap: bool = False,
+                 frame_cache: Optional[FrameCache] = None):
+        self.rendition: str = rendition
+        self.cache: TranscodeCache = cache
+        self.source: VideoStream = VideoStream(video_file, use_mmap, frame_cache)
+
+        # Frames are cached for the version of the video being read
+        self._cache_key: str = str(pathlib.Path(video_file).resolve())
+        self._mtime_ns: int = os.fstat(self.source.file.fileno()).st_mtime_ns
+
+    def next_frame(self) -> bytes:
+        """Get next frame."""
+        frame_nbr = self.source.frame_nbr()
+        if frame_nbr >= self.source.frame_count():
+            return b''
+        data = self.frame_at(frame_nbr)
+        self.source.seek_frame(frame_nbr + 1)
+        return data
+
+    def frame_nbr(self) -> int:
+        return self.source.frame_nbr()
+
+    def frame_count(self) -> int:
+        return self.source.frame_count()
+
+    def seek_frame(self, frame_nbr: int) -> None:
+        self.source.seek_frame(frame_nbr)
+
+    def frame_at(self, frame_nbr: int) -> bytes:
+        """Get frame `frame_nbr` (0-based) of the rendition without moving the stream position."""
+        return self.cache.get(self._cache_key, self._mtime_ns, self.rendition, frame_nbr,
+                              lambda: transcode_frame(self.source.frame_at(frame_nbr), self.rendition))
+
+    def close(self) -> None:
+        self.source.close()
+
+
+def choose_rendition(frame_size: Tuple[int, int], canvas_size: Tuple[int, int],
+                     renditions: Iterable[str] = RENDITIONS) -> str:
+    """Return the smallest of `renditions` still at least as large as the canvas, the full rendition if none is."""
+    for rendition in sorted((name for name in renditions if name in RENDITIONS), key=lambda name: -RENDITIONS[name][0]):
+        width, height = scaled_size(frame_size, rendition)
+        if width >= canvas_size[0] and height >= canvas_size[1]:
+            return rendition
+    return FULL
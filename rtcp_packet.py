@@ -0,0 +1,126 @@
+import struct
+from typing import Union
+
+RTCP_VERSION = 2
+
+RECEIVER_REPORT_TYPE = 201
+APP_TYPE = 204
+# Packet types telling RTCP apart from RTP on a shared port (RFC 5761)
+_RTCP_TYPES = range(192, 224)
+
+# V/P/RC, PT, length in 32-bit words minus one, SSRC of the receiver
+_HEADER_STRUCT = struct.Struct("!BBHI")
+# SSRC of the source, fraction lost and cumulative number of packets lost, extended highest
+# sequence number, interarrival jitter, last SR timestamp, delay since last SR
+_REPORT_BLOCK_STRUCT = struct.Struct("!IIIIII")
+
+RECEIVER_REPORT_SIZE = _HEADER_STRUCT.size + _REPORT_BLOCK_STRUCT.size
+
+# Name of APP packets, following the header
+_APP_NAME_SIZE = 4
+# APP packet of a client asking for a rendition of the video, its name as data
+RENDITION_REQUEST = "REND"
+
+
+class ReceiverReport:
+    """
+    RTCP receiver report about a single source (RFC 3550 6.4.2).
+
+    `fraction_lost` is the fraction of packets lost since the previous report, `jitter` the
+    interarrival jitter in timestamp units. The server doesn't send sender reports, so the
+    LSR and DLSR fields are always 0.
+    """
+
+    def __init__(self, ssrc: int, source_ssrc: int, fraction_lost: float, cumulative_lost: int,
+                 highest_seq_num: int, jitter: int):
+        self.ssrc: int = ssrc
+        self.source_ssrc: int = source_ssrc
+        self.fraction_lost: float = fraction_lost
+        self.cumulative_lost: int = cumulative_lost
+        self.highest_seq_num: int = highest_seq_num
+        self.jitter: int = jitter
+
+    def encode(self) -> bytes:
+        packet = bytearray(RECEIVER_REPORT_SIZE)
+        _HEADER_STRUCT.pack_into(packet, 0, RTCP_VERSION << 6 | 1, RECEIVER_REPORT_TYPE,
+                                 RECEIVER_REPORT_SIZE // 4 - 1, self.ssrc)
+
+        # Fraction lost is fixed point with 8 fractional bits, cumulative lost a signed 24-bit number
+        fraction_lost = min(max(int(self.fraction_lost * 256), 0), 255)
+        cumulative_lost = min(max(self.cumulative_lost, -(1 << 23)), (1 << 23) - 1) & 0xffffff
+        _REPORT_BLOCK_STRUCT.pack_into(packet, _HEADER_STRUCT.size, self.source_ssrc,
+                                       fraction_lost << 24 | cumulative_lost,
+                                       self.highest_seq_num & 0xffffffff, min(self.jitter, 0xffffffff), 0, 0)
+        return bytes(packet)
+
+    @staticmethod
+    def decode(data: Union[bytes, bytearray, memoryview]) -> "ReceiverReport":
+        """Decode the first report block of a receiver report, raise ValueError if there is none."""
+        if len(data) < RECEIVER_REPORT_SIZE:
+            raise ValueError("RTCP packet too short for a receiver report")
+
+        first_byte, packet_type, _, ssrc = _HEADER_STRUCT.unpack_from(data)
+        if first_byte >> 6 != RTCP_VERSION or packet_type != RECEIVER_REPORT_TYPE or first_byte & 0x1f == 0:
+            raise ValueError("Not a receiver report with a report block")
+
+        source_ssrc, lost, highest_seq_num, jitter, _, _ = _REPORT_BLOCK_STRUCT.unpack_from(data, _HEADER_STRUCT.size)
+        cumulative_lost = lost & 0xffffff
+        if cumulative_lost & 0x800000:
+            cumulative_lost -= 1 << 24
+        return ReceiverReport(ssrc, source_ssrc, (lost >> 24) / 256, cumulative_lost, highest_seq_num, jitter)
+
+    def __repr__(self):
+        return f"ReceiverReport(ssrc={self.ssrc}, source_ssrc={self.source_ssrc}, " \
+               f"fraction_lost={self.fraction_lost:.3f}, cumulative_lost={self.cumulative_lost}, " \
+               f"highest_seq_num={self.highest_seq_num}, jitter={self.jitter})"
+
+
+class AppPacket:
+    """
+    RTCP application-defined packet (RFC 3550 6.7), for requests of the client which have no
+    standard RTCP packet, e.g. a rendition of the video.
+
+    `name` is 4 ASCII characters, `data` is padded with zeros to a multiple of 4 bytes.
+    """
+
+    def __init__(self, ssrc: int, name: str, data: bytes = b"", subtype: int = 0):
+        self.ssrc: int = ssrc
+        self.name: str = name
+        self.data: bytes = data
+        self.subtype: int = subtype
+
+    def encode(self) -> bytes:
+        data = self.data + bytes(-len(self.data) % 4)
+        packet = bytearray(_HEADER_STRUCT.size + _APP_NAME_SIZE + len(data))
+        _HEADER_STRUCT.pack_into(packet, 0, RTCP_VERSION << 6 | self.subtype & 0x1f, APP_TYPE,
+                                 len(packet) // 4 - 1, self.ssrc)
+        packet[_HEADER_STRUCT.size:_HEADER_STRUCT.size + _APP_NAME_SIZE] = self.name.encode("ascii")[:_APP_NAME_SIZE]
+        packet[_HEADER_STRUCT.size + _APP_NAME_SIZE:] = data
+        return bytes(packet)
+
+    @staticmethod
+    def decode(data: Union[bytes, bytearray, memoryview]) -> "AppPacket":
+        """Decode an APP packet, raise ValueError if it isn't one."""
+        if len(data) < _HEADER_STRUCT.size + _APP_NAME_SIZE:
+            raise ValueError("RTCP packet too short for an APP packet")
+
+        first_byte, packet_type, length, ssrc = _HEADER_STRUCT.unpack_from(data)
+        if first_byte >> 6 != RTCP_VERSION or packet_type != APP_TYPE:
+            raise ValueError("Not an APP packet")
+
+        end = min((length + 1) * 4, len(data))
+        name = bytes(data[_HEADER_STRUCT.size:_HEADER_STRUCT.size + _APP_NAME_SIZE]).decode("ascii", "replace")
+        return AppPacket(ssrc, name, bytes(data[_HEADER_STRUCT.size + _APP_NAME_SIZE:end]), first_byte & 0x1f)
+
+    def __repr__(self):
+        return f"AppPacket(ssrc={self.ssrc}, name={self.name!r}, data={self.data!r}, subtype={self.subtype})"
+
+
+def packet_type(data: Union[bytes, bytearray, memoryview]) -> int:
+    """Return the packet type of an RTCP packet, 0 if it is too short to have one."""
+    return data[1] if len(data) >= 2 else 0
+
+
+def is_rtcp(data: Union[bytes, bytearray, memoryview]) -> bool:
+    """Tell an RTCP packet apart from an RTP one received on the same port, by its packet type (RFC 5761)."""
+    return packet_type(data) in _RTCP_TYPES
@@ -1,65 +1,104 @@
+import struct
 import time
-from typing import Union
+from typing import Iterator, Optional, Tuple, Union
 
 HEADER_SIZE = 12
 
+# RFC 2435 JPEG main header, following the RTP header in every fragment
+JPEG_HEADER_SIZE = 8
+JPEG_PAYLOAD_TYPE = 26
+
+# Size of RTP packets, small enough to avoid IP fragmentation on usual links
+DEFAULT_MAX_PACKET_SIZE = 1400
+
+# V/P/X/CC, M/PT, sequence number, timestamp, SSRC
+_HEADER_STRUCT = struct.Struct("!BBHII")
+# Sequence number, timestamp and SSRC, following V/P/X/CC and M/PT
+_STREAM_FIELDS_STRUCT = struct.Struct("!HII")
+_STREAM_FIELDS_OFFSET = 2
+# Type-specific and fragment offset, type, Q, width, height
+_JPEG_HEADER_STRUCT = struct.Struct("!IBBBB")
+
 
 class RtpPacket:
     header = bytearray(HEADER_SIZE)
 
     def __init__(self):
-        self.header: bytearray = bytearray()
-        self.payload: bytearray = bytearray()
+        self.header: Union[bytearray, memoryview] = bytearray()
+        self.payload: Union[bytearray, memoryview] = bytearray()
+        self._fields: Tuple[int, int, int, int, int] = (0, 0, 0, 0, 0)
 
     @staticmethod
     def encode(version: int, padding: int, extension: int, cc: int, marker: int,
-               payload_type: int, seq_num: int, ssrc: int, payload: bytearray) -> bytearray:
+               payload_type: int, seq_num: int, ssrc: int,
+               payload: Union[bytes, bytearray, memoryview], timestamp: Optional[int] = None) -> bytearray:
         """Encode the RTP packet with header fields and payload."""
-        header = bytearray(HEADER_SIZE)
-
-        header[0] |= version << 6
-        header[0] |= padding << 5
-        header[0] |= extension << 4
-        header[0] |= cc
+        packet = bytearray(HEADER_SIZE + len(payload))
+        RtpPacket.pack_header_into(packet, 0, version, padding, extension, cc, marker,
+                                   payload_type, seq_num, ssrc, timestamp)
+        packet[HEADER_SIZE:] = payload
+        return packet
 
-        header[1] |= marker << 7
-        header[1] |= payload_type
+    @staticmethod
+    def encode_header(version: int, padding: int, extension: int, cc: int, marker: int,
+                      payload_type: int, seq_num: int, ssrc: int, timestamp: Optional[int] = None) -> bytearray:
+        """
+        Encode the RTP header only.
+
+        The payload can then be sent along with it by a scatter-gather `sendmsg`, without copying both
+        into a single packet.
+        """
+        header = bytearray(HEADER_SIZE)
+        RtpPacket.pack_header_into(header, 0, version, padding, extension, cc, marker,
+                                   payload_type, seq_num, ssrc, timestamp)
+        return header
 
+    @staticmethod
+    def pack_header_into(buffer: Union[bytearray, memoryview], offset: int,
+                         version: int, padding: int, extension: int, cc: int, marker: int,
+                         payload_type: int, seq_num: int, ssrc: int, timestamp: Optional[int] = None) -> None:
+        """Encode the RTP header into a preallocated buffer, so a sender can reuse it for every packet."""
         if seq_num >= (1 << 16):
             raise OverflowError("Sequence number must in [0 - 65535]")
 
-        header[2] = seq_num >> 8
-        header[3] = (0xff & seq_num)
-
-        timestamp = int(time.time()).to_bytes(length=4, byteorder='big')
-        header[4:8] = timestamp
+        if timestamp is None:
+            timestamp = int(time.time())
 
-        header[8:12] = ssrc.to_bytes(length=4, byteorder='big')
+        _HEADER_STRUCT.pack_into(buffer, offset,
+                                 version << 6 | padding << 5 | extension << 4 | cc,
+                                 marker << 7 | payload_type,
+                                 seq_num, timestamp & 0xffffffff, ssrc)
 
-        return header + payload
-
-    def decode(self, byte_stream: Union[bytes, bytearray]):
-        """Decode the RTP packet."""
-        self.header = bytearray(byte_stream[:HEADER_SIZE])
-        self.payload = byte_stream[HEADER_SIZE:]
+    def decode(self, byte_stream: Union[bytes, bytearray, memoryview]):
+        """Decode the RTP packet, header and payload are views over `byte_stream` rather than copies."""
+        view = memoryview(byte_stream)
+        self._fields = _HEADER_STRUCT.unpack_from(view)
+        self.header = view[:HEADER_SIZE]
+        self.payload = view[HEADER_SIZE:]
 
     def get_version(self):
         """Return RTP version."""
-        return int(self.header[0] >> 6)
+        return self._fields[0] >> 6
 
     def get_seq_num(self):
         """Return sequence (frame) number."""
-        return int(self.header[2] << 8 | self.header[3])
+        return self._fields[2]
 
     def get_timestamp(self):
         """Return timestamp."""
-        timestamp = self.header[4] << 24 | self.header[5] << 16 | self.header[6] << 8 | self.header[7]
-        return int(timestamp)
+        return self._fields[3]
+
+    def get_ssrc(self):
+        """Return synchronization source identifier."""
+        return self._fields[4]
+
+    def get_marker(self):
+        """Return marker bit."""
+        return self._fields[1] >> 7
 
     def get_payload_type(self):
         """Return payload type."""
-        pt = self.header[1] & 127
-        return int(pt)
+        return self._fields[1] & 127
 
     def get_payload(self):
         """Return payload."""
@@ -67,4 +106,48 @@ class RtpPacket:
 
     def get_packet(self):
         """Return RTP packet."""
-        return self.header + self.payload
+        return b"".join((self.header, self.payload))
+
+
+def restamp_header(buffer: Union[bytearray, memoryview], offset: int, seq_num: int, timestamp: int, ssrc: int) -> None:
+    """Overwrite sequence number, timestamp and SSRC of an encoded RTP header, leaving other fields as they are."""
+    _STREAM_FIELDS_STRUCT.pack_into(buffer, offset + _STREAM_FIELDS_OFFSET, seq_num, timestamp, ssrc)
+
+
+def encode_jpeg_header(fragment_offset: int, width: int, height: int,
+                       jpeg_type: int = 1, q: int = 255) -> bytes:
+    """
+    Encode the RFC 2435 JPEG main header of a fragment.
+
+    Fragments carry the complete JFIF frame rather than only its scan data, so Q is always
+    255 ("tables in-band") and type only hints the usual 4:2:0 sampling.
+    """
+    header = bytearray(JPEG_HEADER_SIZE)
+    pack_jpeg_header_into(header, 0, fragment_offset, width, height, jpeg_type, q)
+    return bytes(header)
+
+
+def pack_jpeg_header_into(buffer: Union[bytearray, memoryview], offset: int, fragment_offset: int,
+                          width: int, height: int, jpeg_type: int = 1, q: int = 255) -> None:
+    """Encode the RFC 2435 JPEG main header into a preallocated buffer."""
+    if fragment_offset >= (1 << 24):
+        raise OverflowError("Fragment offset must in [0 - 16777215]")
+
+    # Dimensions are in 8-pixel blocks, 0 if they don't fit in a byte
+    width_blocks = width // 8 if width < 2048 else 0
+    height_blocks = height // 8 if height < 2048 else 0
+    _JPEG_HEADER_STRUCT.pack_into(buffer, offset, fragment_offset, jpeg_type, q, width_blocks, height_blocks)
+
+
+def decode_jpeg_header(payload: Union[bytes, bytearray, memoryview]) -> Tuple[int, int, int]:
+    """Decode the RFC 2435 JPEG main header, return fragment offset, width and height."""
+    fragment_offset, _, _, width_blocks, height_blocks = _JPEG_HEADER_STRUCT.unpack_from(payload)
+    return fragment_offset & 0xffffff, width_blocks * 8, height_blocks * 8
+
+
+def fragment_frame(frame: Union[bytes, bytearray, memoryview],
+                   max_fragment_size: int) -> Iterator[Tuple[int, memoryview]]:
+    """Split a frame into (fragment offset, fragment) pairs of at most `max_fragment_size` bytes."""
+    view = memoryview(frame)
+    for offset in range(0, max(len(view), 1), max_fragment_size):
+        yield offset, view[offset:offset + max_fragment_size]
@@ -0,0 +1,103 @@
+import random
+import socket
+from typing import List, Sequence, Tuple, Union
+
+from rtp_packet import RtpPacket, HEADER_SIZE, JPEG_HEADER_SIZE, JPEG_PAYLOAD_TYPE, DEFAULT_MAX_PACKET_SIZE, \
+    pack_jpeg_header_into, fragment_frame, restamp_header
+
+# RTP clock rate of video payloads (RFC 3551)
+MEDIA_CLOCK_RATE = 90000
+
+PACKET_HEADER_SIZE = HEADER_SIZE + JPEG_HEADER_SIZE
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+
+def send_datagrams(sock: socket.socket, datagrams: Sequence[Sequence[Buffer]], address: Tuple) -> None:
+    """
+    Send datagrams, each given as a list of buffers.
+
+    Buffers are gathered by the kernel with `sendmsg`, so headers and payload are never
+    concatenated into a new packet. The standard library doesn't expose `sendmmsg`, so there
+    is still one system call per datagram.
+    """
+    if hasattr(sock, "sendmsg"):
+        for buffers in datagrams:
+            sock.sendmsg(buffers, (), 0, address)
+    else:
+        for buffers in datagrams:
+            sock.sendto(b"".join(buffers), address)
+
+
+class RtpSender:
+    """
+    RTP state of a stream: SSRC, sequence numbers and media clock.
+
+    SSRC, initial sequence number and timestamp are random (RFC 3550). Timestamps follow a
+    90 kHz media clock derived from the frame number, so they increase by a fixed step per
+    frame however late frames are sent, and sequence numbers wrap around at 65536.
+    """
+
+    def __init__(self, frame_rate: float, frame_size: Tuple[int, int] = (0, 0),
+                 max_packet_size: int = DEFAULT_MAX_PACKET_SIZE):
+        self.frame_rate: float = frame_rate
+        self.frame_size: Tuple[int, int] = frame_size
+        self.max_fragment_size: int = max_packet_size - PACKET_HEADER_SIZE
+
+        self.ssrc: int = random.getrandbits(32)
+        self.seq_num: int = random.getrandbits(16)
+        self.timestamp_base: int = random.getrandbits(32)
+
+        # RTP and JPEG headers of all fragments are packed into a buffer reused for every frame
+        self._packet_headers: bytearray = bytearray()
+
+    def timestamp(self, frame_nbr: int) -> int:
+        """Return the RTP timestamp of frame `frame_nbr`."""
+        return (self.timestamp_base + round(frame_nbr * MEDIA_CLOCK_RATE / self.frame_rate)) & 0xffffffff
+
+    def packetize(self, frame: Union[bytes, memoryview], frame_nbr: int) -> List[List[memoryview]]:
+        """
+        Fragment a frame following RFC 2435, return its packets as [headers, fragment] buffers.
+
+        Every fragment of a frame shares its timestamp, the last one has the marker bit set.
+        Header buffers are only valid until the next call.
+        """
+        timestamp = self.timestamp(frame_nbr)
+        fragments = list(fragment_frame(frame, self.max_fragment_size))
+
+        if len(self._packet_headers) < len(fragments) * PACKET_HEADER_SIZE:
+            self._packet_headers = bytearray(len(fragments) * PACKET_HEADER_SIZE)
+        headers = memoryview(self._packet_headers)
+
+        packets = []
+        for fragment_index, (offset, fragment) in enumerate(fragments):
+            header_offset = fragment_index * PACKET_HEADER_SIZE
+            RtpPacket.pack_header_into(
+                headers, header_offset,
+                version=2,
+                padding=0,
+                extension=0,
+                cc=0,
+                marker=int(fragment_index == len(fragments) - 1),
+                payload_type=JPEG_PAYLOAD_TYPE,  # MJPEG
+                seq_num=self.seq_num,
+                ssrc=self.ssrc,
+                timestamp=timestamp
+            )
+            pack_jpeg_header_into(headers, header_offset + HEADER_SIZE, offset, *self.frame_size)
+
+            packets.append([headers[header_offset:header_offset + PACKET_HEADER_SIZE], fragment])
+            self.seq_num = (self.seq_num + 1) & 0xffff
+        return packets
+
+    def restamp(self, packets: List[List[memoryview]], frame_nbr: int) -> None:
+        """
+        Make packets of frame `frame_nbr` built by another sender part of this stream.
+
+        Only sequence numbers, timestamp and SSRC of their headers are overwritten, so packets
+        shared by several streams are restamped in place right before being sent to each one.
+        """
+        timestamp = self.timestamp(frame_nbr)
+        for packet in packets:
+            restamp_header(packet[0], 0, self.seq_num, timestamp, self.ssrc)
+            self.seq_num = (self.seq_num + 1) & 0xffff
@@ -0,0 +1,149 @@
+from typing import Dict, List, Optional, Tuple
+
+# Messages larger than this without a terminating blank line are rejected
+MAX_MESSAGE_SIZE = 4096
+# Responses carry bodies such as the listing of all videos, so the client accepts much larger ones
+MAX_RESPONSE_SIZE = 16 * 1024 * 1024
+
+
+class RtspParseError(ValueError):
+    pass
+
+
+class RtspRequest:
+    """
+    RTSP request line and headers.
+
+    Header names are case-insensitive and stored in lower case, e.g. `headers['cseq']`.
+    """
+
+    def __init__(self, method: str, uri: str, version: str, headers: Dict[str, str]):
+        self.method: str = method
+        self.uri: str = uri
+        self.version: str = version
+        self.headers: Dict[str, str] = headers
+
+    def get_cseq(self) -> Optional[int]:
+        try:
+            return int(self.headers['cseq'])
+        except (KeyError, ValueError):
+            return None
+
+    def __repr__(self):
+        return f"RtspRequest({self.method!r}, {self.uri!r}, {self.version!r}, {self.headers!r})"
+
+
+def parse_request(message: bytes) -> RtspRequest:
+    """Parse a request, without its terminating blank line."""
+    try:
+        lines = message.decode("utf-8").splitlines()
+    except UnicodeDecodeError as err:
+        raise RtspParseError(f"Request isn't valid UTF-8: {err}")
+    if not lines:
+        raise RtspParseError("Empty request")
+
+    # The URI is optional, e.g. for SWITCH requests
+    request_line = lines[0].split()
+    if len(request_line) == 3:
+        method, uri, version = request_line
+    elif len(request_line) == 2:
+        method, version = request_line
+        uri = ""
+    else:
+        raise RtspParseError(f"Malformed request line: {lines[0]!r}")
+    if not version.startswith("RTSP/"):
+        raise RtspParseError(f"Unsupported protocol: {version!r}")
+
+    headers = {}
+    for line in lines[1:]:
+        name, separator, value = line.partition(':')
+        if not separator or not name.strip():
+            raise RtspParseError(f"Malformed header: {line!r}")
+        headers[name.strip().lower()] = value.strip()
+
+    return RtspRequest(method, uri, version, headers)
+
+
+class RtspFramer:
+    """
+    Split the RTSP messages received on a connection.
+
+    Received data is appended to a buffer, from which messages are framed on the blank line
+    ending them, so a message split across several segments or several pipelined messages in
+    a single segment are both handled. Messages are returned without the blank line.
+    """
+
+    def __init__(self, max_message_size: int = MAX_MESSAGE_SIZE):
+        self.max_message_size: int = max_message_size
+        self._buffer: bytearray = bytearray()
+        # Where to resume looking for the terminator, so each byte is only scanned once
+        self._scanned: int = 0
+
+    def feed(self, data: bytes) -> List[bytes]:
+        """Add received data, return the messages completed by it."""
+        self._buffer += data
+
+        messages = []
+        while True:
+            end, terminator_size = self._find_terminator()
+            if end < 0:
+                break
+
+            # Blank lines between requests are ignored
+            message = bytes(self._buffer[:end]).lstrip(b"\r\n")
+            del self._buffer[:end + terminator_size]
+            self._scanned = 0
+
+            if message:
+                messages.append(message)
+
+        if len(self._buffer) > self.max_message_size:
+            raise RtspParseError(f"Message exceeds {self.max_message_size} bytes")
+        return messages
+
+    def _find_terminator(self):
+        # Lines end with LF or CRLF, a request ends with an empty line
+        start = max(self._scanned - 2, 0)
+        lf_end = self._buffer.find(b"\n\n", start)
+        crlf_end = self._buffer.find(b"\n\r\n", start)
+        self._scanned = len(self._buffer)
+
+        if crlf_end >= 0 and (lf_end < 0 or crlf_end < lf_end):
+            return crlf_end + 1, 2
+        if lf_end >= 0:
+            return lf_end + 1, 1
+        return -1, 0
+
+
+class RtspParser(RtspFramer):
+    """Incremental parser of the RTSP requests received on a connection."""
+
+    def feed(self, data: bytes) -> List[RtspRequest]:
+        """Add received data, return the requests completed by it."""
+        return [parse_request(message) for message in super().feed(data)]
+
+
+def parse_client_port(transport: str) -> Optional[int]:
+    """Return the first client RTP port of a Transport header, e.g. `RTP/UDP; client_port= 5000`."""
+    for parameter in transport.split(';'):
+        name, _, value = parameter.partition('=')
+        if name.strip() == 'client_port':
+            try:
+                return int(value.strip().split('-')[0])
+            except ValueError:
+                return None
+    return None
+
+
+def is_multicast(transport: str) -> bool:
+    """Return whether a Transport header requests multicast delivery, e.g. `RTP/UDP;multicast`."""
+    return any(parameter.strip() == 'multicast' for parameter in transport.split(';'))
+
+
+def parse_multicast_address(transport: str) -> Optional[Tuple[str, int]]:
+    """Return the group address and port of a Transport header, e.g. `RTP/UDP;multicast;destination=...;port=5004`."""
+    parameters = dict(parameter.strip().partition('=')[::2] for parameter in transport.split(';'))
+    try:
+        return parameters['destination'].strip(), int(parameters['port'].strip().split('-')[0])
+    except (KeyError, ValueError):
+        return None
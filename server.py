@@ -1,31 +1,78 @@
+import argparse
 import configparser
-import datetime
-import io
 import logging
-import math
+import multiprocessing
 import pathlib
+import signal
 import socket
+from typing import Optional, Type
 
-from PIL import Image
-
+from catalog import VideoCatalog
+from frame_cache import FrameCache
+from live_channel import ChannelRegistry
+from renditions import RENDITION_FOLDER, RENDITIONS
 from server_worker import ServerWorker
-from video_stream import VideoStream
+from pacing import PacingScheduler
+from transcode_cache import TranscodeCache
+from video_stream import DEFAULT_FRAME_RATE
 
 
 class Server:
-    def __init__(self, hostname: str = None, server_port: int = None):
+    def __init__(self, hostname: str = None, server_port: int = None, reuse_port: bool = False):
         self.config_parser: configparser.ConfigParser = configparser.ConfigParser()
         self.config_parser.read("./config/server.cfg")
         self.rtsp_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        if reuse_port:
+            # Let several server processes listen on the same port, the kernel balances connections
+            self.rtsp_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
         self.logger = logging.getLogger("streaming-app.server")
 
+        # Frames shared by all sessions, disabled when the size is 0
+        frame_cache_size = self.config_parser.getint('Stream', 'frame_cache_size', fallback=0)
+        self.frame_cache: Optional[FrameCache] = FrameCache(frame_cache_size) if frame_cache_size > 0 else None
+
+        # Frames of all playing sessions are sent by a single scheduler thread
+        self.scheduler = PacingScheduler()
+
+        # Sessions watching the same video share its live channel, if enabled, which can also be multicast
+        self.channels: Optional[ChannelRegistry] = None
+        if self.config_parser.getboolean('Stream', 'live_channels', fallback=False):
+            self.channels = ChannelRegistry(self.scheduler,
+                                            self.config_parser.get('Multicast', 'group', fallback=None) or None,
+                                            self.config_parser.getint('Multicast', 'port', fallback=5004),
+                                            self.config_parser.getint('Multicast', 'ttl', fallback=1),
+                                            self.config_parser.get('Multicast', 'interface', fallback="0.0.0.0"))
+
+        # Lower renditions of the videos, chosen by clients for their window size or bandwidth
+        renditions = [rendition.strip() for rendition in
+                      self.config_parser.get('Stream', 'renditions', fallback="").split(',') if rendition.strip()]
+        unknown = [rendition for rendition in renditions if rendition not in RENDITIONS]
+        if unknown:
+            raise ValueError(f"Unknown renditions: {', '.join(unknown)}")
+        video_folder = pathlib.Path(self.config_parser['Server']['video_folder'])
+
+        # Frames of renditions not generated yet are transcoded as they are streamed, disabled when the size is 0
+        transcode_cache_size = self.config_parser.getint('Stream', 'transcode_cache_size', fallback=0)
+        transcode_cache: Optional[TranscodeCache] = None
+        if renditions and transcode_cache_size > 0:
+            transcode_cache = TranscodeCache(video_folder / RENDITION_FOLDER / "frames", transcode_cache_size,
+                                             self.config_parser.getint('Stream', 'transcode_memory_size', fallback=0))
+            self.logger.debug(f"Transcode cache: {transcode_cache.stats()}")
+
+        self.catalog = VideoCatalog(video_folder,
+                                    self.config_parser.getint('Stream', 'frame_rate', fallback=DEFAULT_FRAME_RATE),
+                                    renditions=renditions, transcode_cache=transcode_cache)
+
     def run(self):
-        # Generate video info files to reduce computation
+        # Video infos are generated in the background, clients are accepted meanwhile
         self.generate_video_infos()
 
-        self.rtsp_socket.bind((self.config_parser['Server']['hostname'],
-                               self.config_parser.getint('Server', 'server_port')))
-        self.rtsp_socket.listen(self.config_parser.getint('Socket', 'backlog'))
+        self.serve()
+
+    def serve(self):
+        """Accept clients until interrupted, without generating video infos."""
+        self.bind()
+        self.scheduler.start()
 
         self.logger.info("Server Started")
 
@@ -35,47 +82,78 @@ class Server:
                 connection_socket, client_addr = self.rtsp_socket.accept()
                 self.logger.debug(f"Client {client_addr[0]}:{client_addr[1]} has connected")
                 ServerWorker(connection_socket, client_addr,
-                             pathlib.Path(self.config_parser['Server']['video_folder'])).start()
+                             self.catalog,
+                             self.scheduler,
+                             self.config_parser['Stream'],
+                             self.frame_cache,
+                             self.channels).start()
         except KeyboardInterrupt:
             pass
 
+    def bind(self):
+        """Bind and listen on the RTSP port."""
+        self.rtsp_socket.bind((self.config_parser['Server']['hostname'],
+                               self.config_parser.getint('Server', 'server_port')))
+        self.rtsp_socket.listen(self.config_parser.getint('Socket', 'backlog'))
+
     def generate_video_infos(self):
-        video_path: pathlib.Path = pathlib.Path(self.config_parser['Server']['video_folder'])
-        for video_file in video_path.iterdir():
-            # Skipping non-video files
-            if video_file.suffix.lower() != ".mjpeg":
-                continue
+        """Start generating info and index files of new or modified videos in a process pool."""
+        return self.catalog.generate_infos()
 
-            # Skip if info file has existed
-            info_file_path: pathlib.Path = video_file.with_suffix(".info")
-            if info_file_path.exists():
-                continue
 
-            info_file_path.touch()
-            with open(info_file_path, 'r+') as info_file:
-                info_file.write(f"filename={video_file.name}\n")
+def _serve_worker(server_class: Type[Server]):
+    server_class(reuse_port=True).serve()
 
-                stream = VideoStream(video_file)
-                image = Image.open(io.BytesIO(stream.next_frame()))
-                info_file.write(f"resolution={image.size[0]}x{image.size[1]}\n")
 
-                while stream.next_frame():
-                    pass
+def run_workers(server_class: Type[Server], workers: int):
+    """
+    Run `workers` server processes sharing the RTSP port through SO_REUSEPORT.
 
-                duration = datetime.timedelta(seconds=math.ceil(stream.frame_nbr() * 0.05))
-                info_file.write(f"duration={duration}\n")
+    Video infos and indexes are generated once by the parent process while the workers serve
+    clients, workers generate those of videos requested meanwhile on demand.
+    """
+    processes = [multiprocessing.Process(target=_serve_worker, args=(server_class,)) for _ in range(workers)]
+    for process in processes:
+        process.start()
 
+    server_class().generate_video_infos()
+
+    # Stop the workers along with the parent process, whether it is interrupted or terminated
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+            process.join()
+
+
+def main(server_class: Type[Server] = Server):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of server processes sharing the RTSP port")
+    args = parser.parse_args()
+
+    if args.workers > 1 and not hasattr(socket, "SO_REUSEPORT"):
+        parser.error("--workers requires SO_REUSEPORT, which isn't supported on this platform")
 
-if __name__ == "__main__":
     # Setting up server logger
     logger = logging.getLogger("streaming-app.server")
     logger.setLevel(logging.DEBUG)
 
     stream_handler = logging.StreamHandler()
-    formatter = logging.Formatter('%(asctime)s %(name)s %(levelname)s: %(message)s')
+    formatter = logging.Formatter('%(asctime)s %(process)d %(name)s %(levelname)s: %(message)s')
     stream_handler.setFormatter(formatter)
 
     logger.addHandler(stream_handler)
 
-    server = Server()
-    server.run()
+    if args.workers > 1:
+        run_workers(server_class, args.workers)
+    else:
+        server = server_class()
+        server.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,32 @@
+import configparser
 import errno
 import logging
 import pathlib
 import random
+import select
 import socket
 import threading
 from enum import Enum
-from typing import Tuple, Optional, List
+from typing import Dict, Tuple, Optional, List, Union
 
-from rtp_packet import RtpPacket
-from video_stream import VideoStream
+from catalog import VideoCatalog
+from frame_cache import FrameCache
+from live_channel import ChannelRegistry
+from pacing import PacingScheduler
+from rate_adapter import FrameRateAdapter
+from renditions import FULL, TranscodedStream, scaled_size
+from rtcp_packet import APP_TYPE, RENDITION_REQUEST, AppPacket, ReceiverReport, packet_type
+from rtp_packet import DEFAULT_MAX_PACKET_SIZE
+from rtp_sender import RtpSender, Buffer, send_datagrams
+from rtsp_parser import RtspParser, RtspParseError, RtspRequest, parse_client_port, is_multicast
+from video_stream import VideoStream, DEFAULT_FRAME_RATE
 
 
 class RespondType(Enum):
     OK_200 = 200
+    BAD_REQUEST_400 = 400
     FILE_NOT_FOUND_404 = 404
+    UNSUPPORTED_TRANSPORT_461 = 461
     CON_ERR_500 = 500
 
 
@@ -33,63 +46,146 @@ class RequestType(Enum):
     SWITCH = 'SWITCH'
 
 
-class ServerWorker(threading.Thread):
-    def __init__(self, connection: socket.socket, client_addr: Tuple,
-                 video_path: pathlib.Path):
-        super(ServerWorker, self).__init__()
+class RtspSession:
+    """
+    RTSP state machine of a client session.
 
-        self.connection_socket = connection
-        self.connection_socket.settimeout(1)
+    It doesn't own any I/O: subclasses decide how replies and RTP packets are sent
+    and how the stream is paced, by implementing `send_rtsp`, `send_rtp`,
+    `start_streaming` and `stop_streaming`. Pacers call `send_next_frame` every
+    `frame_interval` seconds and report how late it was with `report_lateness`.
+
+    With `channels`, sessions don't stream on their own but subscribe to the live channel
+    of their video, which only calls `send_rtp`. Sessions set up with a multicast transport
+    are not sent anything, they join the group their channel is multicast to.
+
+    Clients may ask for a lower rendition of the video, in SETUP or later in an RTCP APP
+    packet. The stream switches to it on the next frame, once the catalog has generated it.
+    """
+
+    def __init__(self, client_addr: Tuple, catalog: VideoCatalog, stream_config: configparser.SectionProxy,
+                 frame_cache: Optional[FrameCache] = None, channels: Optional[ChannelRegistry] = None):
         self.client_addr = client_addr
-        self.video_path: pathlib.Path = video_path
+        self.catalog: VideoCatalog = catalog
+        self.video_path: pathlib.Path = catalog.video_path
+        self.channels: Optional[ChannelRegistry] = channels
+        self.filename: Optional[str] = None
+        self.multicast: bool = False
+        self.use_mmap: bool = stream_config.getboolean('use_mmap', fallback=False)
+        self.frame_cache: Optional[FrameCache] = frame_cache
+
+        # Frames are fragmented so that RTP packets stay below the path MTU
+        self.max_packet_size: int = stream_config.getint('max_packet_size', fallback=DEFAULT_MAX_PACKET_SIZE)
+        self.rtp_sender: Optional[RtpSender] = None
+        self.frame_size: Tuple[int, int] = (0, 0)
+        self.rendition: str = FULL
+        self.requested_rendition: str = FULL
+
+        # Frames are thinned for congested receivers, from the RTCP reports of the client
+        max_frame_step = 1
+        if stream_config.getboolean('adaptive_frame_rate', fallback=False):
+            max_frame_step = stream_config.getint('max_frame_step', fallback=4)
+        self.rate_adapter: FrameRateAdapter = FrameRateAdapter(
+            max_frame_step,
+            stream_config.getfloat('loss_threshold', fallback=0.05),
+            stream_config.getfloat('jitter_threshold', fallback=0.05))
 
         self.current_session_id: Optional[int] = None
         self.seq = 1
-        self.streaming_thread = None
+        self.rtsp_parser: RtspParser = RtspParser()
 
-        self.stream_handler: Optional[VideoStream] = None
-        self.stream_stop_flag: threading.Event = threading.Event()
+        self.stream_handler: Optional[Union[VideoStream, TranscodedStream]] = None
         self.state = ServerState.INIT
 
+        self.frame_interval: float = 1 / DEFAULT_FRAME_RATE
+        self.last_lateness: float = 0.0
+        self.max_lateness: float = 0.0
+        self.late_frames: int = 0
+
         self.rtp_port: Optional[int] = None
-        self.rtp_socket: Optional[socket.socket] = None
 
         self.logger = logging.getLogger(
             f"streaming-app.server.server-worker-{self.client_addr[0]}:{self.client_addr[1]}")
 
-    def run(self) -> None:
+    def send_rtsp(self, data: bytes) -> None:
+        """Send raw bytes on the RTSP connection."""
+        raise NotImplementedError
+
+    def send_rtp(self, packets: List[List[Buffer]]) -> None:
+        """Send RTP packets, each given as a list of buffers, to the client's RTP port."""
+        raise NotImplementedError
+
+    def start_streaming(self) -> None:
+        """Start calling `send_next_frame` at the video frame rate."""
+        raise NotImplementedError
+
+    def stop_streaming(self) -> None:
+        """Stop sending frames."""
+        raise NotImplementedError
+
+    def open_rtp(self) -> None:
+        """Prepare sending RTP packets, called upon SETUP."""
+        pass
+
+    def receive_rtcp(self, data: bytes) -> None:
+        """Process an RTCP packet received from the client, receiver reports about its stream or rendition requests."""
+        try:
+            if packet_type(data) == APP_TYPE:
+                app_packet = AppPacket.decode(data)
+                if app_packet.name == RENDITION_REQUEST:
+                    self.request_rendition(app_packet.data.rstrip(b"\0").decode("ascii", "replace"))
+                return
+            report = ReceiverReport.decode(data)
+        except ValueError as err:
+            self.logger.debug(f"Ignored RTCP packet: {err}")
+            return
+
+        if self.rtp_sender is None or report.source_ssrc != self.rtp_sender.ssrc:
+            return
+        self.logger.debug(f"Received {report}")
+        if self.rate_adapter.on_report(report):
+            self.logger.info(f"Sending 1 frame out of {self.rate_adapter.frame_step}, "
+                             f"{report.fraction_lost:.1%} packets lost")
+
+    def request_rendition(self, rendition: str) -> None:
+        """Switch to another rendition of the video from the next frame, if the catalog has it."""
+        if rendition != FULL and rendition not in self.catalog.renditions:
+            self.logger.debug(f"Unavailable rendition requested: {rendition}")
+            return
+        if rendition != self.requested_rendition:
+            self.logger.debug(f"Rendition requested: {rendition}")
+            self.requested_rendition = rendition
+
+    def receive_rtsp(self, data: bytes) -> None:
         """
-        Receive RTSP request from the client.
+        Process the requests completed by data received on the RTSP connection.
+
+        Raise ConnectionError if the data can't be parsed, the connection should then be closed.
         """
-        while True:
-            try:
-                data: bytes = self.connection_socket.recv(256)
-                if not data:
-                    raise ConnectionError
+        try:
+            requests = self.rtsp_parser.feed(data)
+        except RtspParseError as err:
+            self.logger.warning(f"Malformed request: {err}")
+            self.reply_rtsp(RespondType.BAD_REQUEST_400)
+            raise ConnectionError from err
 
-                self.logger.debug(f"Data received: {data}")
-                self.process_rtsp_request(data.decode("utf-8"))
-            except TimeoutError:
-                # In the future, try to ping the client
-                pass
-            except ConnectionError:
-                self._cleanup()
-                break
+        for request in requests:
+            self.process_rtsp_request(request)
 
-    def process_rtsp_request(self, data):
+    def process_rtsp_request(self, request: RtspRequest):
         """Process RTSP request sent from the client."""
-        # Get the request type
-        request = data.split('\n')
-        request_type = RequestType(request[0].split(' ')[0])
-
-        # Get the RTSP sequence number
-        seq = int(request[1].split(' ')[1])
-
         # Check if sequence number and session ID match
-        if seq != self.seq:
+        if request.get_cseq() != self.seq:
             self.reply_rtsp(RespondType.CON_ERR_500)
             return
 
+        try:
+            request_type = RequestType(request.method)
+        except ValueError:
+            self.logger.warning(f"Unsupported request: {request.method}")
+            request_type = None
+            self.reply_rtsp(RespondType.BAD_REQUEST_400)
+
         if request_type == RequestType.SETUP:
             self.handle_setup_req(request)
         elif request_type == RequestType.PLAY:
@@ -105,44 +201,78 @@ class ServerWorker(threading.Thread):
 
         self.seq += 1
 
-    def handle_setup_req(self, request: List[str]):
+    def handle_setup_req(self, request: RtspRequest):
         if self.state == ServerState.INIT:
             self.logger.debug("Processing SETUP")
 
-            filename = request[0].split(' ')[1]
+            filename = request.uri
+
+            # Get the RTP/UDP port from the Transport header, multicast streams are sent to the channel's group
+            transport = request.headers.get('transport', '')
+            self.multicast = is_multicast(transport)
+            if self.multicast:
+                if not self.channels or not self.channels.multicast_group:
+                    self.logger.warning("Multicast requested but not enabled")
+                    self.reply_rtsp(RespondType.UNSUPPORTED_TRANSPORT_461)
+                    return
+            else:
+                self.rtp_port = parse_client_port(transport)
+                if self.rtp_port is None:
+                    self.logger.warning("No client port in SETUP request")
+                    self.reply_rtsp(RespondType.BAD_REQUEST_400)
+                    return
 
             # Generate a randomized RTSP session ID
             self.current_session_id = random.randint(100000, 999999)
 
-            # Get the RTP/UDP port from the last line
-            self.rtp_port = int(request[2].split(' ')[3])
-
             # Set up RTP port for streaming video
-            self.rtp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.open_rtp()
 
             # Send RTSP reply
             try:
-                self.stream_handler = VideoStream(self.video_path / filename)
+                # Only videos of the catalog are streamed, whatever else the folder holds
+                video_info = self.catalog.get_info(filename)
+                if video_info is None:
+                    raise IOError(f"No such video: {filename}")
+                self.stream_handler = VideoStream(self.video_path / filename, self.use_mmap, self.frame_cache)
+                frame_rate = float(video_info.get('frame_rate', DEFAULT_FRAME_RATE))
+                self.frame_interval = 1 / frame_rate
+
+                frame_size = (0, 0)
+                if 'resolution' in video_info:
+                    width, height = video_info['resolution'].split('x')
+                    frame_size = (int(width), int(height))
+                self.rtp_sender = RtpSender(frame_rate, frame_size, self.max_packet_size)
+                self.frame_size = frame_size
+                self.filename = filename
                 self.state = ServerState.READY
-                self.reply_rtsp(RespondType.OK_200)
+
+                headers = {}
+                if self.multicast:
+                    group, port = self.channels.multicast_address(filename)
+                    headers['Transport'] = f"RTP/UDP;multicast;destination={group};port={port}"
+                else:
+                    # Multicast members share the full rendition
+                    self.request_rendition(request.headers.get('rendition', FULL))
+                    headers['Renditions'] = ", ".join((FULL,) + self.catalog.renditions)
+                if 'resolution' in video_info:
+                    headers['Resolution'] = video_info['resolution']
+                self.reply_rtsp(RespondType.OK_200, headers)
             except IOError:
                 self.reply_rtsp(RespondType.FILE_NOT_FOUND_404)
         else:
             self.logger.warning("Server has been set up")
             self.reply_rtsp(RespondType.CON_ERR_500)
 
-    def handle_play_req(self, request: List[str]):
+    def handle_play_req(self, request: RtspRequest):
         if self.state == ServerState.READY:
             self.logger.debug("Processing PLAY")
             self.state = ServerState.PLAYING
 
-            self.stream_stop_flag.clear()
-
             self.reply_rtsp(RespondType.OK_200)
 
-            # Create a new thread and start sending RTP packets
-            self.streaming_thread = threading.Thread(target=self.stream_video)
-            self.streaming_thread.start()
+            # Start sending RTP packets
+            self.start_sending()
         else:
             self.reply_rtsp(RespondType.CON_ERR_500)
             if self.state == ServerState.PLAYING:
@@ -150,12 +280,12 @@ class ServerWorker(threading.Thread):
             elif self.state != ServerState.READY:
                 self.logger.warning("Server hasn't been set up")
 
-    def handle_pause_req(self, request: List[str]):
+    def handle_pause_req(self, request: RtspRequest):
         if self.state == ServerState.PLAYING:
             self.logger.debug("Processing PAUSE")
             self.state = ServerState.READY
 
-            self.stream_stop_flag.set()
+            self.stop_sending()
 
             self.reply_rtsp(RespondType.OK_200)
         else:
@@ -165,81 +295,194 @@ class ServerWorker(threading.Thread):
             elif self.state != ServerState.PLAYING:
                 self.logger.warning("Can't pause video")
 
-    def handle_teardown_req(self, request: List[str]):
+    def handle_teardown_req(self, request: RtspRequest):
         if self.state == ServerState.INIT:
             self.logger.warning("Connection has already been tearing down")
         self.state = ServerState.INIT
         self.logger.debug("Processing TEARDOWN")
 
-        self.stream_stop_flag.set()
+        self.stop_sending()
 
         self.reply_rtsp(RespondType.OK_200)
 
-    def handle_describe_req(self, request: List[str]):
-        file_name: pathlib.Path = self.video_path / pathlib.Path(request[0].split(" ")[1])
-        if not file_name.exists():
+    def handle_describe_req(self, request: RtspRequest):
+        body = self.catalog.describe(request.uri)
+        if body is None:
             self.reply_rtsp(RespondType.FILE_NOT_FOUND_404)
             return
 
-        response: str = f"RTSP/1.0 200 OK\nCSeq: {self.seq}\n"
-        with open(file_name.with_suffix(".info"), 'r') as info_file:
-            response += info_file.read()
-
-        self.connection_socket.sendall(response.encode("utf-8"))
+        self.send_rtsp(f"RTSP/1.0 200 OK\nCSeq: {self.seq}\n".encode("utf-8") + body + b"\n")
 
-    def handle_switch_req(self, request: List[str]):
+    def handle_switch_req(self, request: RtspRequest):
         self.logger.debug("Processing SWITCH")
 
-        response: str = f"RTSP/1.0 200 OK\nCSeq: {self.seq}\n"
+        self.send_rtsp(f"RTSP/1.0 200 OK\nCSeq: {self.seq}\n".encode("utf-8") + self.catalog.listing() + b"\n")
 
-        for file_path in self.video_path.iterdir():
-            if file_path.suffix.lower() == ".mjpeg":
-                response += file_path.name + "\n"
+    def start_sending(self) -> None:
+        """Start sending the video, as a stream of its own or through its live channel."""
+        if self.channels:
+            self.channels.subscribe(self.filename, self, self.multicast)
+        else:
+            self.start_streaming()
 
-        self.connection_socket.sendall(response.encode("utf-8"))
+    def stop_sending(self) -> None:
+        if self.channels:
+            self.channels.unsubscribe(self.filename, self)
+        else:
+            self.stop_streaming()
+
+    def send_next_frame(self) -> None:
+        """Read the next frame and send it as RTP packets, fragmented following RFC 2435."""
+        if self.requested_rendition != self.rendition:
+            self._switch_rendition()
+
+        frame = self.stream_handler.next_frame()
+        frame_nbr = self.stream_handler.frame_nbr()
+        if not frame:
+            # End of stream takes the slot after the last frame, so a jitter buffer plays it last
+            frame = bytes(5)
+            frame_nbr += 1
+        elif self.rate_adapter.skips(frame_nbr):
+            return
 
-    def stream_video(self):
-        """Private method for sending RTP packets"""
-        client_rtp_addr = (self.client_addr[0], self.rtp_port)
+        packets = self.rtp_sender.packetize(frame, frame_nbr)
+        try:
+            self.send_rtp(packets)
+        except OSError as err:
+            # The remaining fragments are useless without the failed one
+            self.logger.debug(f"Failed to send RTP packet: {err}")
 
+    def _switch_rendition(self) -> None:
+        # Frames of all renditions are numbered alike, the next one is read from the requested rendition
+        rendition = self.requested_rendition
         try:
-            self.logger.debug(f"Starting stream to client: {client_rtp_addr}")
-            while True:
-                self.stream_stop_flag.wait(0.05)
-
-                if self.stream_stop_flag.is_set():
-                    break
-
-                payload = self.stream_handler.next_frame()
-                if not payload:
-                    payload = bytes(5)
-
-                frame_nbr = self.stream_handler.frame_nbr()
-
-                data = RtpPacket.encode(
-                    version=2,
-                    padding=0,
-                    extension=0,
-                    cc=0,
-                    marker=0,
-                    payload_type=26,  # MJPEG
-                    seq_num=frame_nbr,
-                    ssrc=0,
-                    payload=payload
-                )
-
-                try:
-                    self.rtp_socket.sendto(data, client_rtp_addr)
-                except OSError:
-                    # Exception due to OSX not allowing UDP-package > 9216 bytes
-                    # https://stackoverflow.com/a/35335138
+            stream_handler = self.catalog.open_rendition(self.filename, rendition, self.use_mmap, self.frame_cache)
+            if stream_handler is None:
+                return
+            stream_handler.seek_frame(self.stream_handler.frame_nbr())
+        except (IOError, IndexError) as err:
+            self.logger.warning(f"Failed to switch to {rendition} rendition: {err}")
+            self.requested_rendition = self.rendition
+            return
+
+        self.stream_handler.close()
+        self.stream_handler = stream_handler
+        self.rtp_sender.frame_size = scaled_size(self.frame_size, rendition)
+        self.rendition = rendition
+        self.logger.debug(f"Switched to {rendition} rendition")
+
+    def report_lateness(self, lateness: float) -> None:
+        """Record how many seconds after its deadline the last frame was sent."""
+        self.last_lateness = lateness
+        self.max_lateness = max(self.max_lateness, lateness)
+
+        # Frames later than a whole frame interval mean the server can't keep up
+        if lateness > self.frame_interval:
+            if self.late_frames % 100 == 0:
+                self.logger.warning(f"Frame sent {lateness * 1000:.1f}ms late, server may be overloaded")
+            self.late_frames += 1
+
+    def log_streaming_stats(self) -> None:
+        self.logger.debug(f"Max lateness: {self.max_lateness * 1000:.1f}ms, late frames: {self.late_frames}")
+        if self.frame_cache:
+            self.logger.debug(f"Frame cache: {self.frame_cache.stats()}")
+        if self.catalog.transcode_cache:
+            self.logger.debug(f"Transcode cache: {self.catalog.transcode_cache.stats()}")
+
+    def reply_rtsp(self, code: RespondType, headers: Optional[Dict[str, str]] = None) -> None:
+        """Send RTSP reply to the client, successful ones may carry extra `headers`."""
+        # Like requests, replies end with a blank line, so that pipelined replies can be told apart
+        if code == RespondType.OK_200:
+            reply = f"RTSP/1.0 200 OK\nCSeq: {self.seq}\nSession: {self.current_session_id}\n"
+            reply += "".join(f"{name}: {value}\n" for name, value in (headers or {}).items())
+            self.send_rtsp((reply + "\n").encode("utf-8"))
+
+        # Error messages
+        elif code == RespondType.BAD_REQUEST_400:
+            reply = f"RTSP/1.0 400 BAD REQUEST\nCSeq: {self.seq}\n\n"
+            self.send_rtsp(reply.encode("utf-8"))
+        elif code == RespondType.FILE_NOT_FOUND_404:
+            reply = f"RTSP/1.0 404 FILE NOT FOUND\nCSeq: {self.seq}\n\n"
+            self.send_rtsp(reply.encode("utf-8"))
+        elif code == RespondType.UNSUPPORTED_TRANSPORT_461:
+            reply = f"RTSP/1.0 461 UNSUPPORTED TRANSPORT\nCSeq: {self.seq}\n\n"
+            self.send_rtsp(reply.encode("utf-8"))
+        elif code == RespondType.CON_ERR_500:
+            reply = f"RTSP/1.0 500 CONNECTION ERROR\nCSeq: {self.seq}\n\n"
+            self.send_rtsp(reply.encode("utf-8"))
+
+
+class ServerWorker(RtspSession, threading.Thread):
+    def __init__(self, connection: socket.socket, client_addr: Tuple,
+                 catalog: VideoCatalog, scheduler: PacingScheduler, stream_config: configparser.SectionProxy,
+                 frame_cache: Optional[FrameCache] = None, channels: Optional[ChannelRegistry] = None):
+        threading.Thread.__init__(self)
+        RtspSession.__init__(self, client_addr, catalog, stream_config, frame_cache, channels)
+
+        self.connection_socket = connection
+        self.connection_socket.settimeout(1)
+
+        self.scheduler: PacingScheduler = scheduler
+        self.rtp_socket: Optional[socket.socket] = None
+
+    def run(self) -> None:
+        """
+        Receive RTSP requests and RTCP packets from the client.
+        """
+        while True:
+            try:
+                # RTCP packets of the client are received on the RTP socket, multiplexed with RTP (RFC 5761)
+                sockets = [self.connection_socket] + ([self.rtp_socket] if self.rtp_socket else [])
+                readable, _, _ = select.select(sockets, [], [], 1)
+                if self.rtp_socket in readable:
+                    self._receive_rtcp()
+                if self.connection_socket not in readable:
+                    # In the future, try to ping the client
                     continue
 
-        finally:
-            self.logger.debug("Stop streaming")
+                data: bytes = self.connection_socket.recv(4096)
+                if not data:
+                    raise ConnectionError
+
+                self.logger.debug(f"Data received: {data}")
+                self.receive_rtsp(data)
+            except TimeoutError:
+                pass
+            except ConnectionError:
+                self._cleanup()
+                break
+
+    def send_rtsp(self, data: bytes) -> None:
+        self.connection_socket.sendall(data)
+
+    def _receive_rtcp(self) -> None:
+        try:
+            self.receive_rtcp(self.rtp_socket.recv(2048))
+        except OSError:
+            # ICMP errors about RTP packets sent earlier are reported by the next receive
+            pass
+
+    def send_rtp(self, packets: List[List[Buffer]]) -> None:
+        send_datagrams(self.rtp_socket, packets, (self.client_addr[0], self.rtp_port))
+
+    def open_rtp(self) -> None:
+        self.rtp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def start_streaming(self) -> None:
+        # Let the scheduler send RTP packets at the video frame rate
+        self.logger.debug(f"Starting stream to client: {(self.client_addr[0], self.rtp_port)}")
+        self.scheduler.add(self, self.frame_interval)
+
+    def stop_streaming(self) -> None:
+        self.scheduler.remove(self)
+        self.logger.debug("Stop streaming")
+        self.log_streaming_stats()
 
     def _cleanup(self):
         self.logger.info("Client has disconnected")
+        if self.channels:
+            self.channels.unsubscribe(self.filename, self)
+        self.scheduler.remove(self)
         try:
             self.connection_socket.shutdown(socket.SHUT_RD)
             self.connection_socket.close()
@@ -254,17 +497,3 @@ class ServerWorker(threading.Thread):
             except OSError as err:
                 if err.errno != errno.ENOTCONN:
                     raise err
-
-    def reply_rtsp(self, code: RespondType) -> None:
-        """Send RTSP reply to the client."""
-        if code == RespondType.OK_200:
-            reply = f"RTSP/1.0 200 OK\nCSeq: {self.seq}\nSession: {self.current_session_id}\n"
-            self.connection_socket.sendall(reply.encode("utf-8"))
-
-        # Error messages
-        elif code == RespondType.FILE_NOT_FOUND_404:
-            reply = f"RTSP/1.0 404 FILE NOT FOUND\nCSeq: {self.seq}\n"
-            self.connection_socket.sendall(reply.encode("utf-8"))
-        elif code == RespondType.CON_ERR_500:
-            reply = f"RTSP/1.0 500 CONNECTION ERROR\nCSeq: {self.seq}\n"
-            self.connection_socket.sendall(reply.encode("utf-8"))
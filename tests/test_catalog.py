@@ -0,0 +1,143 @@
+import io
+import os
+import pathlib
+import time
+
+import pytest
+from PIL import Image
+
+from catalog import VideoCatalog
+from renditions import TranscodedStream
+from transcode_cache import TranscodeCache
+from video_stream import INFO_SUFFIX, VideoStream, load_video_info, video_info_is_current
+
+FRAME_COUNT = 40
+
+
+def write_video(file_path: pathlib.Path, frame_count: int = FRAME_COUNT):
+    data = io.BytesIO()
+    Image.new('RGB', (64, 48), 'blue').save(data, 'JPEG')
+    frame = data.getvalue()
+
+    with open(file_path, 'wb') as file:
+        for _ in range(frame_count):
+            file.write(f"{len(frame):05d}".encode())
+            file.write(frame)
+
+
+@pytest.fixture
+def catalog(tmp_path: pathlib.Path):
+    write_video(tmp_path / "a.mjpeg")
+    write_video(tmp_path / "b.mjpeg")
+    (tmp_path / "notes.txt").write_text("not a video")
+    return VideoCatalog(tmp_path, frame_rate=20, check_interval=0)
+
+
+def test_generate_infos_in_background(catalog):
+    futures = catalog.generate_infos(max_workers=2)
+    assert len(futures) == 2
+    for future in futures:
+        future.result(timeout=30)
+
+    info = load_video_info(catalog.video_path / "a.mjpeg")
+    assert info['resolution'] == "64x48"
+    assert info['duration'] == "0:00:02"
+    assert video_info_is_current(catalog.video_path / "b.mjpeg")
+
+    # Up-to-date videos are skipped
+    assert catalog.generate_infos() == []
+
+
+def test_get_info_on_demand(catalog):
+    assert not (catalog.video_path / "a.mjpeg").with_suffix(INFO_SUFFIX).exists()
+    assert catalog.get_info("a.mjpeg")['filename'] == "a.mjpeg"
+    assert catalog.get_info("missing.mjpeg") is None
+
+
+def test_only_listed_videos_are_read(tmp_path: pathlib.Path):
+    video_path = tmp_path / "videos"
+    video_path.mkdir()
+    write_video(tmp_path / "outside.mjpeg")
+    (video_path / "notes.txt").write_text("not a video")
+    (video_path / "broken.mjpeg").write_bytes(b"not a frame")
+    catalog = VideoCatalog(video_path, frame_rate=20, check_interval=0)
+
+    assert catalog.get_info("notes.txt") is None
+    assert catalog.describe("../outside.mjpeg") is None
+    assert catalog.rendition_file("../outside.mjpeg", "full") is None
+    assert not (tmp_path / "outside.info").exists()
+    assert not (tmp_path / "outside.index").exists()
+
+    # Videos which can't be parsed are reported missing rather than failing the request
+    assert catalog.get_info("broken.mjpeg") is None
+
+
+def test_modified_video_is_regenerated(catalog):
+    video_file = catalog.video_path / "a.mjpeg"
+    catalog.get_info("a.mjpeg")
+
+    write_video(video_file, FRAME_COUNT * 2)
+    stat = video_file.stat()
+    os.utime(video_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert not video_info_is_current(video_file)
+    assert catalog.get_info("a.mjpeg")['duration'] == "0:00:04"
+
+
+def test_listing_invalidated_by_new_video(catalog):
+    assert sorted(catalog.listing().split()) == [b"a.mjpeg", b"b.mjpeg"]
+
+    write_video(catalog.video_path / "c.mjpeg")
+    stat = catalog.video_path.stat()
+    os.utime(catalog.video_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert sorted(catalog.listing().split()) == [b"a.mjpeg", b"b.mjpeg", b"c.mjpeg"]
+
+
+def test_describe_is_cached(catalog):
+    # Generating the info writes into the folder, which invalidates the catalog once
+    catalog.get_info("a.mjpeg")
+
+    body = catalog.describe("a.mjpeg")
+    assert body.startswith(b"filename=a.mjpeg\n")
+    assert b"mtime=" not in body
+    assert catalog.describe("a.mjpeg") is body
+
+
+def test_rendition_generated_on_demand(tmp_path: pathlib.Path):
+    write_video(tmp_path / "a.mjpeg")
+    catalog = VideoCatalog(tmp_path, frame_rate=20, check_interval=0, renditions=['half'])
+
+    assert catalog.rendition_file("a.mjpeg", "full") == tmp_path / "a.mjpeg"
+    assert catalog.rendition_file("a.mjpeg", "quarter") is None
+    assert catalog.rendition_file("a.mjpeg", "half") is None
+
+    for _ in range(100):
+        path = catalog.rendition_file("a.mjpeg", "half")
+        if path:
+            break
+        time.sleep(0.05)
+    assert path == tmp_path / ".renditions" / "a.half.mjpeg"
+    assert catalog.listing() == b"a.mjpeg\n"
+
+
+def test_rendition_transcoded_until_generated(tmp_path: pathlib.Path):
+    write_video(tmp_path / "a.mjpeg")
+    catalog = VideoCatalog(tmp_path, frame_rate=20, check_interval=0, renditions=['half'])
+    assert catalog.open_rendition("a.mjpeg", "half") is None
+
+    write_video(tmp_path / "b.mjpeg")
+    catalog = VideoCatalog(tmp_path, frame_rate=20, check_interval=0, renditions=['half'],
+                           transcode_cache=TranscodeCache(tmp_path / "frames", 1 << 20))
+    assert catalog.open_rendition("b.mjpeg", "quarter") is None
+    stream = catalog.open_rendition("b.mjpeg", "half")
+    assert isinstance(stream, TranscodedStream)
+    assert Image.open(io.BytesIO(stream.frame_at(0))).size == (32, 24)
+    stream.close()
+
+    for _ in range(100):
+        stream = catalog.open_rendition("b.mjpeg", "half")
+        if isinstance(stream, VideoStream):
+            break
+        stream.close()
+        time.sleep(0.05)
+    assert stream.filename == tmp_path / ".renditions" / "b.half.mjpeg"
+    stream.close()
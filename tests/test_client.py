@@ -1,4 +1,6 @@
+import queue
 import random
+import time
 import tkinter as tk
 
 import pytest
@@ -13,12 +15,16 @@ def mock_socket_socket(socket_type, socket_stream_type):
 class MockSocket:
     def __init__(self):
         self.session_id = random.randint(100000, 999999)
+        self.responses = queue.SimpleQueue()
 
     def connect(self, addr):
         pass
 
     def sendall(self, data):
         print(data)
+        # Reply to the request with its CSeq
+        c_seq = data.decode().split('\n')[1].split(' ')[1]
+        self.responses.put(f"RTSP/1.0 200 OK\nCSeq: {c_seq}\nSession: {self.session_id}\n\n".encode())
 
     def settimeout(self, time):
         pass
@@ -30,7 +36,25 @@ class MockSocket:
         return 'localhost', random.randint(100000, 999999)
 
     def recv(self, byte_size):
-        return f"RTSP/1.0 200 OK\nCSeq: 1\nSession: {self.session_id}".encode()
+        try:
+            return self.responses.get(timeout=0.1)
+        except queue.Empty:
+            raise TimeoutError
+
+    def shutdown(self, how):
+        pass
+
+    def close(self):
+        pass
+
+
+def wait_for_responses(client: Client):
+    """Responses are received in the background, then handled from the Tk main loop."""
+    if client.rtsp_channel is None:
+        return
+    while client.rtsp_channel.pending():
+        time.sleep(0.01)
+    client.rtsp_channel.dispatch()
 
 
 @pytest.fixture
@@ -52,16 +76,20 @@ def test_basic_functional(mocker):
     root.update()
 
     client.setup_video()
+    wait_for_responses(client)
     assert client.sequence_number == 1
     assert client.session_id == client.connection_socket.session_id
 
     client.play_video()
+    wait_for_responses(client)
     assert client.sequence_number == 2
 
     client.pause_video()
+    wait_for_responses(client)
     assert client.sequence_number == 3
 
     client.stop_video()
+    wait_for_responses(client)
     assert client.sequence_number == 4
 
     # Tearing down root
@@ -70,19 +98,27 @@ def test_basic_functional(mocker):
 
 def test_duplicate_action_should_not_count(generate_client):
     generate_client.setup_video()
+    wait_for_responses(generate_client)
     generate_client.setup_video()
+    wait_for_responses(generate_client)
     assert generate_client.sequence_number == 1
 
     generate_client.play_video()
+    wait_for_responses(generate_client)
     generate_client.play_video()
+    wait_for_responses(generate_client)
     assert generate_client.sequence_number == 2
 
     generate_client.pause_video()
+    wait_for_responses(generate_client)
     generate_client.pause_video()
+    wait_for_responses(generate_client)
     assert generate_client.sequence_number == 3
 
     generate_client.stop_video()
+    wait_for_responses(generate_client)
     generate_client.stop_video()
+    wait_for_responses(generate_client)
     assert generate_client.sequence_number == 4
 
 
@@ -91,10 +127,12 @@ def test_invalid_state_transition_should_not_count(generate_client):
     # Currently, state is ready INIT
     # =========================================================
     generate_client.pause_video()
+    wait_for_responses(generate_client)
     assert generate_client.session_id == 0
     assert generate_client.sequence_number == 0
 
     generate_client.play_video()
+    wait_for_responses(generate_client)
     assert generate_client.session_id == 0
     assert generate_client.sequence_number == 0
 
@@ -102,20 +140,26 @@ def test_invalid_state_transition_should_not_count(generate_client):
     # Change state to READY
     # =========================================================
     generate_client.setup_video()
+    wait_for_responses(generate_client)
 
     generate_client.setup_video()
+    wait_for_responses(generate_client)
     assert generate_client.sequence_number == 1
 
     generate_client.pause_video()
+    wait_for_responses(generate_client)
     assert generate_client.sequence_number == 1
 
     # =========================================================
     # Change state to PLAYING
     # =========================================================
     generate_client.play_video()
+    wait_for_responses(generate_client)
 
     generate_client.play_video()
+    wait_for_responses(generate_client)
     assert generate_client.sequence_number == 2
 
     generate_client.setup_video()
+    wait_for_responses(generate_client)
     assert generate_client.sequence_number == 2
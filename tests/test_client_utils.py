@@ -0,0 +1,152 @@
+import io
+import random
+import socket
+import time
+
+from PIL import Image
+
+from client_utils import FrameAssembler, DropOldestQueue, PlaybackStats, ReceptionStats, RtspChannel, decode_frame
+from rtp_packet import RtpPacket, encode_jpeg_header, fragment_frame
+
+FRAGMENT_SIZE = 100
+
+
+def packetize(frame: bytes, first_seq_num: int, timestamp: int):
+    fragments = list(fragment_frame(frame, FRAGMENT_SIZE))
+    packets = []
+    for index, (offset, fragment) in enumerate(fragments):
+        packet = RtpPacket()
+        packet.decode(RtpPacket.encode(2, 0, 0, 0, int(index == len(fragments) - 1), 26,
+                                       (first_seq_num + index) & 0xffff, 0,
+                                       encode_jpeg_header(offset, 384, 288) + fragment, timestamp))
+        packets.append(packet)
+    return packets
+
+
+def test_reassemble_frames():
+    assembler = FrameAssembler()
+    frames = [random.randbytes(random.randint(1, 1000)) for _ in range(5)]
+
+    seq_num = 65530
+    for frame in frames:
+        packets = packetize(frame, seq_num, 1)
+        seq_num += len(packets)
+
+        assert [assembler.push(packet) for packet in packets[:-1]] == [None] * (len(packets) - 1)
+        assert assembler.push(packets[-1]) == frame
+
+
+def test_drop_frame_with_lost_fragment():
+    assembler = FrameAssembler()
+    frame = random.randbytes(1000)
+
+    packets = packetize(frame, 0, 1)
+    del packets[3]
+    assert all(assembler.push(packet) is None for packet in packets)
+
+    # The next frame is received as usual
+    packets = packetize(frame, 10, 2)
+    assert [assembler.push(packet) for packet in packets][-1] == frame
+
+
+def test_drop_oldest_queue():
+    queue = DropOldestQueue(2)
+    for item in range(4):
+        queue.put(item)
+
+    assert queue.dropped == 2
+    assert [queue.get(timeout=0), queue.get(timeout=0)] == [2, 3]
+    assert queue.get(timeout=0.01) is None
+
+
+def test_decode_frame_scaled():
+    image = Image.new('RGB', (640, 480), 'red')
+    data = io.BytesIO()
+    image.save(data, 'JPEG')
+
+    frame = decode_frame(data.getvalue(), (150, 100))
+    assert frame.size == (150, 100)
+    assert frame.getpixel((75, 50))[0] > 200
+
+
+def test_playback_stats_stale_frame():
+    stats = PlaybackStats()
+    for _ in range(100):
+        stats.record_decode(0.05)
+        stats.record_render(0.01, 0.2)
+
+    assert abs(stats.latency - 0.2) < 1e-3
+    assert not stats.is_stale(0.1, max_latency=0.2)
+    assert stats.is_stale(0.15, max_latency=0.2)
+
+
+def test_reception_stats_loss_and_wrap_around():
+    stats = ReceptionStats()
+    assert stats.report() is None
+
+    # Every tenth packet is lost, across a sequence number wrap-around
+    for seq_num in range(65501, 65602):
+        if seq_num % 10:
+            stats.update(packetize(b"a", seq_num & 0xffff, seq_num * 100)[0], seq_num / 900)
+    report = stats.report()
+    assert report.highest_seq_num == 65601
+    assert report.cumulative_lost == 10
+    assert abs(report.fraction_lost - 0.1) < 0.01
+    # Packets are evenly spaced, in time as in timestamps
+    assert report.jitter == 0
+
+    # Fraction lost only covers packets since the previous report
+    stats.update(packetize(b"a", 65602 & 0xffff, 65602 * 100)[0], 65602 / 900)
+    assert stats.report().fraction_lost == 0
+
+
+def test_reception_stats_jitter():
+    stats = ReceptionStats()
+    for seq_num in range(200):
+        # Timestamps advance by 10 ms, packets arrive 5 ms early or late
+        arrival = seq_num / 100 + (0.005 if seq_num % 2 else -0.005)
+        stats.update(packetize(b"a", seq_num, seq_num * 900)[0], arrival)
+
+    assert abs(stats.report().jitter - 900) < 50
+
+
+def test_rtsp_channel_matches_responses():
+    client_socket, server_socket = socket.socketpair()
+    responses = []
+    channel = RtspChannel(client_socket, 16, lambda: responses.append(None))
+
+    channel.send(1, "DESCRIBE a.mjpeg RTSP/1.0\nCSeq: 1\n", lambda response: responses.append(response))
+    channel.send(2, "SWITCH RTSP/1.0\nCSeq: 2\n", lambda response: responses.append(response))
+    assert server_socket.recv(1024).count(b"\n\n") == 2
+
+    # Responses may arrive in any order and be split across segments
+    server_socket.sendall(b"RTSP/1.0 200 OK\nCSeq: 2\na.mjpeg\n\nRTSP/1.0 404 FILE NOT FOUND\nCSeq: 1\n\n")
+    while channel.pending():
+        time.sleep(0.01)
+    channel.dispatch()
+    assert [(response.sequence_number, response.status_code) for response in responses] == [(2, 200), (1, 404)]
+
+    server_socket.close()
+    time.sleep(0.1)
+    channel.dispatch()
+    assert responses[-1] is None
+    channel.close()
+
+
+def test_rtsp_channel_large_response():
+    client_socket, server_socket = socket.socketpair()
+    responses = []
+    channel = RtspChannel(client_socket, 1024, lambda: responses.append(None))
+
+    # A listing of many videos is far larger than any request
+    channel.send(1, "SWITCH RTSP/1.0\nCSeq: 1\n", lambda response: responses.append(response))
+    listing = "".join(f"video-{index:04d}.mjpeg\n" for index in range(1000))
+    server_socket.sendall(f"RTSP/1.0 200 OK\nCSeq: 1\n{listing}\n".encode())
+    while channel.pending():
+        time.sleep(0.01)
+    channel.dispatch()
+    assert len(responses) == 1 and responses[0].status_code == 200
+    assert len(responses[0].content) > 16000
+
+    channel.close()
+    server_socket.close()
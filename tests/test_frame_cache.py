@@ -0,0 +1,41 @@
+from frame_cache import FrameCache
+
+
+def test_hit_and_miss():
+    cache = FrameCache(100)
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return b"frame"
+
+    assert cache.get(("a", 0), loader) == b"frame"
+    assert cache.get(("a", 0), loader) == b"frame"
+    assert len(loads) == 1
+    assert cache.hits == 1
+    assert cache.misses == 1
+
+
+def test_lru_eviction():
+    cache = FrameCache(30)
+    for frame_nbr in range(3):
+        cache.get(("a", frame_nbr), lambda: bytes(10))
+
+    # Touch frame 0, so frame 1 becomes the least recently used one
+    cache.get(("a", 0), lambda: bytes(10))
+    cache.get(("a", 3), lambda: bytes(10))
+
+    assert cache.evictions == 1
+    assert cache.current_bytes == 30
+
+    misses = cache.misses
+    cache.get(("a", 0), lambda: bytes(10))
+    assert cache.misses == misses
+    cache.get(("a", 1), lambda: bytes(10))
+    assert cache.misses == misses + 1
+
+
+def test_oversized_frame_is_not_cached():
+    cache = FrameCache(5)
+    assert cache.get(("a", 0), lambda: bytes(10)) == bytes(10)
+    assert cache.stats()["frames"] == 0
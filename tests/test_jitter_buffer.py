@@ -0,0 +1,62 @@
+import time
+
+from jitter_buffer import JitterBuffer
+
+CLOCK_RATE = 90000
+FRAME_INTERVAL = 0.02
+TICKS_PER_FRAME = int(FRAME_INTERVAL * CLOCK_RATE)
+
+
+def test_reorder_frames():
+    buffer = JitterBuffer(target_depth=3)
+    for frame_nbr in (1, 0, 2):
+        buffer.put(frame_nbr * TICKS_PER_FRAME, bytes([frame_nbr]))
+
+    assert [buffer.get(timeout=1) for _ in range(3)] == [bytes([0]), bytes([1]), bytes([2])]
+
+
+def test_wait_for_target_depth():
+    buffer = JitterBuffer(target_depth=3)
+    buffer.put(0, b"0")
+    buffer.put(TICKS_PER_FRAME, b"1")
+
+    assert buffer.get(timeout=FRAME_INTERVAL) is None
+    assert buffer.occupancy() == 2
+
+
+def test_steady_playout():
+    buffer = JitterBuffer(target_depth=2)
+    for frame_nbr in range(5):
+        buffer.put(frame_nbr * TICKS_PER_FRAME, bytes([frame_nbr]))
+
+    start = time.monotonic()
+    for _ in range(5):
+        buffer.get(timeout=1)
+    assert 4 * FRAME_INTERVAL <= time.monotonic() - start < 6 * FRAME_INTERVAL
+
+
+def test_late_frame_is_dropped():
+    buffer = JitterBuffer(target_depth=1)
+    buffer.put(TICKS_PER_FRAME, b"1")
+    assert buffer.get(timeout=1) == b"1"
+
+    buffer.put(0, b"0")
+    assert buffer.late_frames == 1
+    assert buffer.occupancy() == 0
+
+
+def test_underrun():
+    buffer = JitterBuffer(target_depth=1)
+    buffer.put(0, b"0")
+    assert buffer.get(timeout=1) == b"0"
+
+    assert buffer.get(timeout=FRAME_INTERVAL) is None
+    assert buffer.underruns == 1
+
+
+def test_timestamp_wrap_around():
+    buffer = JitterBuffer(target_depth=2)
+    buffer.put(2 ** 32 - TICKS_PER_FRAME, b"0")
+    buffer.put(0, b"1")
+
+    assert [buffer.get(timeout=1) for _ in range(2)] == [b"0", b"1"]
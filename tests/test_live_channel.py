@@ -0,0 +1,206 @@
+import io
+import logging
+import pathlib
+import socket
+
+import pytest
+from PIL import Image
+
+from catalog import VideoCatalog
+from client_utils import FrameAssembler
+from live_channel import ChannelRegistry, LiveChannel
+from pacing import PacingScheduler
+from rate_adapter import FrameRateAdapter
+from renditions import FULL, generate_rendition
+from rtp_packet import RtpPacket
+from rtp_sender import RtpSender
+
+FRAME_RATE = 20
+FRAME_COUNT = 5
+MAX_PACKET_SIZE = 120
+MULTICAST_GROUP = "239.255.42.42"
+
+
+class MockSession:
+    def __init__(self, video_path: pathlib.Path, filename: str = "video.mjpeg"):
+        self.video_path = video_path
+        self.catalog = VideoCatalog(video_path, renditions=['half'])
+        self.filename = filename
+        self.rendition = self.requested_rendition = FULL
+        self.rtp_sender = RtpSender(FRAME_RATE, (384, 288), MAX_PACKET_SIZE)
+        self.max_packet_size = MAX_PACKET_SIZE
+        self.use_mmap = False
+        self.frame_cache = None
+        self.rate_adapter = FrameRateAdapter()
+        self.logger = logging.getLogger("streaming-app.test")
+
+        self.packets = []
+
+    def send_rtp(self, packets):
+        # Shared buffers are restamped for the next session, keep a copy
+        for buffers in packets:
+            packet = RtpPacket()
+            packet.decode(b"".join(buffers))
+            self.packets.append(packet)
+
+    def frames(self):
+        assembler = FrameAssembler()
+        return [frame for frame in map(assembler.push, self.packets) if frame]
+
+
+@pytest.fixture
+def video_file(tmp_path: pathlib.Path):
+    frames = [bytes([frame_nbr]) * 300 for frame_nbr in range(FRAME_COUNT)]
+
+    file_path = tmp_path / "video.mjpeg"
+    with open(file_path, 'wb') as file:
+        for frame in frames:
+            file.write(f"{len(frame):05d}".encode())
+            file.write(frame)
+    return file_path, frames
+
+
+def test_sessions_share_frames(video_file):
+    file_path, frames = video_file
+    channel = LiveChannel(file_path, FRAME_RATE, (384, 288), MAX_PACKET_SIZE)
+    sessions = [MockSession(file_path.parent) for _ in range(3)]
+    for session in sessions:
+        channel.add(session)
+
+    for _ in range(FRAME_COUNT):
+        channel.send_next_frame()
+
+    for session in sessions:
+        assert session.frames() == frames
+        assert {packet.get_ssrc() for packet in session.packets} == {session.rtp_sender.ssrc}
+        seq_nums = [packet.get_seq_num() for packet in session.packets]
+        assert seq_nums == [(seq_nums[0] + i) % 65536 for i in range(len(seq_nums))]
+
+
+def test_late_subscriber_joins_in_sync(video_file):
+    file_path, frames = video_file
+    channel = LiveChannel(file_path, FRAME_RATE, (384, 288), MAX_PACKET_SIZE)
+    first, second = MockSession(file_path.parent), MockSession(file_path.parent)
+
+    channel.add(first)
+    channel.send_next_frame()
+    channel.add(second)
+    for _ in range(FRAME_COUNT):
+        channel.send_next_frame()
+
+    # The video loops, the second session starts at the frame the first one is watching
+    assert first.frames() == frames + frames[:1]
+    assert second.frames() == frames[1:] + frames[:1]
+    assert channel.remove(first) is False
+    assert channel.remove(second) is True
+
+
+def test_congested_subscriber_thinned(video_file):
+    file_path, frames = video_file
+    channel = LiveChannel(file_path, FRAME_RATE, (384, 288), MAX_PACKET_SIZE)
+    congested, other = MockSession(file_path.parent), MockSession(file_path.parent)
+    congested.rate_adapter.frame_step = 2
+    channel.add(congested)
+    channel.add(other)
+
+    for _ in range(FRAME_COUNT):
+        channel.send_next_frame()
+
+    assert congested.frames() == frames[::2]
+    assert other.frames() == frames
+
+
+def test_subscriber_switches_rendition(tmp_path: pathlib.Path):
+    file_path = tmp_path / "video.mjpeg"
+    with open(file_path, 'wb') as file:
+        for color in ['red', 'green', 'blue', 'white', 'black']:
+            data = io.BytesIO()
+            Image.new('RGB', (384, 288), color).save(data, 'JPEG')
+            file.write(f"{len(data.getvalue()):05d}".encode())
+            file.write(data.getvalue())
+    generate_rendition(file_path, 'half')
+
+    channel = LiveChannel(file_path, FRAME_RATE, (384, 288), 1400)
+    switching, other = MockSession(tmp_path), MockSession(tmp_path)
+    channel.add(switching)
+    channel.add(other)
+
+    channel.send_next_frame()
+    switching.requested_rendition = 'half'
+    for _ in range(FRAME_COUNT - 1):
+        channel.send_next_frame()
+
+    # The switch happens on the next frame, which is still the same picture
+    sizes = [Image.open(io.BytesIO(frame)).size for frame in switching.frames()]
+    assert sizes == [(384, 288)] + [(192, 144)] * (FRAME_COUNT - 1)
+    colors = [Image.open(io.BytesIO(frame)).resize((1, 1)).getpixel((0, 0)) for frame in switching.frames()]
+    other_colors = [Image.open(io.BytesIO(frame)).resize((1, 1)).getpixel((0, 0)) for frame in other.frames()]
+    assert [max(range(3), key=color.__getitem__) for color in colors] == \
+        [max(range(3), key=color.__getitem__) for color in other_colors]
+    assert switching.rendition == 'half'
+
+    seq_nums = [packet.get_seq_num() for packet in switching.packets]
+    assert seq_nums == [(seq_nums[0] + i) % 65536 for i in range(len(seq_nums))]
+
+
+def test_registry_starts_and_stops_channels(video_file):
+    file_path, _ = video_file
+    scheduler = PacingScheduler()
+    registry = ChannelRegistry(scheduler)
+    sessions = [MockSession(file_path.parent) for _ in range(2)]
+
+    for session in sessions:
+        registry.subscribe(file_path.name, session)
+    assert registry.channel_count() == 1
+    assert len(scheduler.stats()) == 1
+
+    registry.unsubscribe(file_path.name, sessions[0])
+    assert registry.channel_count() == 1
+
+    registry.unsubscribe(file_path.name, sessions[1])
+    registry.unsubscribe(file_path.name, sessions[1])
+    assert registry.channel_count() == 0
+    assert scheduler.stats() == {}
+
+
+def test_multicast_sent_once(video_file):
+    file_path, frames = video_file
+    registry = ChannelRegistry(PacingScheduler(), MULTICAST_GROUP, multicast_interface="127.0.0.1")
+    group, port = registry.multicast_address(file_path.name)
+    assert registry.multicast_address(file_path.name) == (group, port)
+    assert registry.multicast_address("other.mjpeg") == (group, port + 2)
+
+    # Join the group on loopback, like a client on the same host
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    receiver.bind(("", port))
+    receiver.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP,
+                        socket.inet_aton(group) + socket.inet_aton("127.0.0.1"))
+    receiver.settimeout(0.2)
+
+    sessions = [MockSession(file_path.parent) for _ in range(3)]
+    unicast = MockSession(file_path.parent)
+    for session in sessions:
+        registry.subscribe(file_path.name, session, multicast=True)
+    registry.subscribe(file_path.name, unicast)
+    channel = registry._channels[file_path.name]
+
+    for _ in range(FRAME_COUNT):
+        channel.send_next_frame()
+    for session in sessions + [unicast]:
+        registry.unsubscribe(file_path.name, session)
+
+    multicast = MockSession(file_path.parent)
+    while True:
+        try:
+            multicast.send_rtp([[receiver.recv(2048)]])
+        except socket.timeout:
+            break
+    receiver.close()
+
+    # Multicast subscribers share the channel's stream, unicast ones still get their own
+    assert multicast.frames() == frames
+    assert len(multicast.packets) == len(unicast.packets)
+    assert {packet.get_ssrc() for packet in multicast.packets} == {channel.rtp_sender.ssrc}
+    assert unicast.frames() == frames
+    assert all(session.packets == [] for session in sessions)
@@ -0,0 +1,57 @@
+import time
+
+from pacing import PacingScheduler
+
+FRAME_INTERVAL = 0.01
+
+
+class MockSession:
+    def __init__(self, port: int = 0, processing_time: float = 0.0):
+        self.client_addr = ('localhost', port)
+        self.processing_time = processing_time
+        self.frames_sent = 0
+
+        self.last_lateness = 0.0
+        self.max_lateness = 0.0
+        self.late_frames = 0
+
+    def send_next_frame(self):
+        self.frames_sent += 1
+        time.sleep(self.processing_time)
+
+    def report_lateness(self, lateness: float):
+        self.last_lateness = lateness
+        self.max_lateness = max(self.max_lateness, lateness)
+
+
+def test_processing_time_does_not_drift():
+    scheduler = PacingScheduler()
+    scheduler.start()
+
+    session = MockSession(processing_time=FRAME_INTERVAL / 2)
+    scheduler.add(session, FRAME_INTERVAL)
+    time.sleep(50 * FRAME_INTERVAL)
+    scheduler.remove(session)
+
+    # Waiting a fixed interval between frames would only send about 33 of them. Bounds are loose,
+    # the scheduler thread may be descheduled for a while on a loaded machine
+    assert session.frames_sent >= 40
+    assert session.max_lateness < 10 * FRAME_INTERVAL
+
+
+def test_remove_stops_sending():
+    scheduler = PacingScheduler()
+    scheduler.start()
+
+    sessions = [MockSession(port) for port in range(3)]
+    for session in sessions:
+        scheduler.add(session, FRAME_INTERVAL)
+    time.sleep(5 * FRAME_INTERVAL)
+
+    scheduler.remove(sessions[0])
+    assert len(scheduler.stats()) == 2
+    frames_sent = sessions[0].frames_sent
+
+    time.sleep(5 * FRAME_INTERVAL)
+    assert sessions[0].frames_sent <= frames_sent + 1
+    assert sessions[1].frames_sent > frames_sent
@@ -0,0 +1,34 @@
+from rate_adapter import FrameRateAdapter
+from rtcp_packet import ReceiverReport
+from rtp_sender import MEDIA_CLOCK_RATE
+
+
+def make_report(fraction_lost: float = 0.0, jitter: float = 0.0) -> ReceiverReport:
+    return ReceiverReport(1, 2, fraction_lost, 0, 0, int(jitter * MEDIA_CLOCK_RATE))
+
+
+def test_congestion_thins_frames():
+    adapter = FrameRateAdapter(max_frame_step=4)
+    assert not any(adapter.skips(frame_nbr) for frame_nbr in range(10))
+
+    assert adapter.on_report(make_report(fraction_lost=0.2))
+    assert adapter.frame_step == 2
+    assert adapter.on_report(make_report(jitter=0.1))
+    assert not adapter.on_report(make_report(fraction_lost=0.2))
+    assert adapter.frame_step == 4
+    assert [frame_nbr for frame_nbr in range(10) if not adapter.skips(frame_nbr)] == [0, 4, 8]
+
+
+def test_recovery_after_clean_reports():
+    adapter = FrameRateAdapter(max_frame_step=4, recovery_reports=3)
+    adapter.on_report(make_report(fraction_lost=0.5))
+
+    assert [adapter.on_report(make_report()) for _ in range(3)] == [False, False, True]
+    assert adapter.frame_step == 1
+    assert not any(adapter.on_report(make_report()) for _ in range(3))
+
+
+def test_disabled_adaptation():
+    adapter = FrameRateAdapter(max_frame_step=1)
+    assert not adapter.on_report(make_report(fraction_lost=1.0))
+    assert adapter.frame_step == 1
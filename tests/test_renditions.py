@@ -0,0 +1,92 @@
+import io
+import pathlib
+import time
+
+from PIL import Image
+
+from renditions import FULL, TranscodedStream, choose_rendition, generate_rendition, rendition_is_current, \
+    rendition_path, transcode_frame
+from transcode_cache import TranscodeCache
+from video_stream import VideoStream, load_frame_index
+
+FRAME_COUNT = 10
+
+
+def make_frame(color: str, size=(384, 288)) -> bytes:
+    data = io.BytesIO()
+    Image.new('RGB', size, color).save(data, 'JPEG', quality=95)
+    return data.getvalue()
+
+
+def write_video(file_path: pathlib.Path, frames):
+    with open(file_path, 'wb') as file:
+        for frame in frames:
+            file.write(f"{len(frame):05d}".encode())
+            file.write(frame)
+
+
+def test_transcode_frame():
+    frame = make_frame('red')
+    for rendition, size in (('half', (192, 144)), ('quarter', (96, 72))):
+        transcoded = transcode_frame(frame, rendition)
+        assert len(transcoded) < len(frame)
+        assert Image.open(io.BytesIO(transcoded)).size == size
+
+
+def test_generate_rendition(tmp_path: pathlib.Path):
+    video_file = tmp_path / "movie.mjpeg"
+    colors = ['red', 'green', 'blue', 'white', 'black'] * 2
+    write_video(video_file, [make_frame(color) for color in colors])
+    assert rendition_path(video_file, FULL) == video_file
+    assert not rendition_is_current(video_file, 'half')
+
+    path = generate_rendition(video_file, 'half')
+    assert path == tmp_path / ".renditions" / "movie.half.mjpeg"
+    assert rendition_is_current(video_file, 'half')
+    assert load_frame_index(path) is not None
+
+    # Frames are numbered alike in every rendition, so streams can switch between them
+    stream = VideoStream(path)
+    assert stream.frame_count() == FRAME_COUNT
+    stream.seek_frame(2)
+    image = Image.open(io.BytesIO(stream.next_frame()))
+    assert image.size == (192, 144)
+    assert image.getpixel((96, 72))[2] > 200
+    stream.close()
+
+    # Renditions are outdated by any change of the video
+    time.sleep(0.01)
+    write_video(video_file, [make_frame('red')])
+    assert not rendition_is_current(video_file, 'half')
+
+
+def test_choose_rendition():
+    assert choose_rendition((384, 288), (100, 70)) == 'half'
+    assert choose_rendition((384, 288), (90, 70)) == 'quarter'
+    assert choose_rendition((384, 288), (300, 200)) == FULL
+    assert choose_rendition((384, 288), (90, 70), [FULL, 'half']) == 'half'
+    assert choose_rendition((384, 288), (90, 70), [FULL]) == FULL
+
+
+def test_transcoded_stream(tmp_path: pathlib.Path):
+    video_file = tmp_path / "movie.mjpeg"
+    colors = ['red', 'green', 'blue', 'white', 'black'] * 2
+    write_video(video_file, [make_frame(color) for color in colors])
+    cache = TranscodeCache(tmp_path / "frames", 1 << 20)
+
+    stream = TranscodedStream(video_file, 'half', cache)
+    assert stream.frame_count() == FRAME_COUNT
+    stream.seek_frame(2)
+    image = Image.open(io.BytesIO(stream.next_frame()))
+    assert image.size == (192, 144)
+    assert image.getpixel((96, 72))[2] > 200
+    assert stream.frame_nbr() == 3
+    stream.close()
+
+    # Frames read again by any stream come from the cache, the same as the generated rendition ones
+    stream = TranscodedStream(video_file, 'half', cache)
+    assert stream.frame_at(2) == transcode_frame(make_frame('blue'), 'half')
+    assert cache.stats()["disk_hits"] == 1
+    stream.seek_frame(FRAME_COUNT)
+    assert stream.next_frame() == b''
+    stream.close()
@@ -0,0 +1,46 @@
+import pytest
+
+from rtcp_packet import AppPacket, ReceiverReport, RECEIVER_REPORT_SIZE, RENDITION_REQUEST, is_rtcp
+from rtp_packet import RtpPacket, JPEG_PAYLOAD_TYPE
+
+
+def test_receiver_report_round_trip():
+    report = ReceiverReport(1234, 5678, 0.25, 42, (3 << 16) + 65000, 900)
+    data = report.encode()
+    assert len(data) == RECEIVER_REPORT_SIZE
+
+    decoded = ReceiverReport.decode(data)
+    assert (decoded.ssrc, decoded.source_ssrc, decoded.fraction_lost, decoded.cumulative_lost,
+            decoded.highest_seq_num, decoded.jitter) == (1234, 5678, 0.25, 42, (3 << 16) + 65000, 900)
+
+
+def test_receiver_report_clamps_fields():
+    # Duplicated packets make the cumulative number lost negative
+    decoded = ReceiverReport.decode(ReceiverReport(1, 2, 1.0, -5, 0, 0).encode())
+    assert decoded.fraction_lost == 255 / 256
+    assert decoded.cumulative_lost == -5
+
+
+@pytest.mark.parametrize("data", [b"", bytes(RECEIVER_REPORT_SIZE), bytes([0x80, 201]) + bytes(30)])
+def test_invalid_receiver_report(data):
+    with pytest.raises(ValueError):
+        ReceiverReport.decode(data)
+
+
+def test_app_packet_round_trip():
+    data = AppPacket(1234, RENDITION_REQUEST, b"half").encode()
+    assert len(data) % 4 == 0
+
+    packet = AppPacket.decode(data)
+    assert (packet.ssrc, packet.name, packet.data) == (1234, RENDITION_REQUEST, b"half")
+    # Data is padded to 32-bit words
+    assert AppPacket.decode(AppPacket(1, "TEST", b"full!").encode()).data == b"full!\0\0\0"
+
+    with pytest.raises(ValueError):
+        AppPacket.decode(ReceiverReport(1, 2, 0.0, 0, 0, 0).encode())
+
+
+def test_rtcp_told_apart_from_rtp():
+    assert is_rtcp(ReceiverReport(1, 2, 0.0, 0, 0, 0).encode())
+    for marker in (0, 1):
+        assert not is_rtcp(RtpPacket.encode(2, 0, 0, 0, marker, JPEG_PAYLOAD_TYPE, 0, 0, b"payload"))
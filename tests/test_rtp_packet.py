@@ -2,7 +2,7 @@ import random
 
 import pytest
 
-from rtp_packet import RtpPacket
+from rtp_packet import RtpPacket, HEADER_SIZE, JPEG_HEADER_SIZE, encode_jpeg_header, decode_jpeg_header, fragment_frame
 
 PAYLOAD_MAX_SIZE = 200
 
@@ -76,3 +76,49 @@ def test_encoding_payload():
     result: bytearray = RtpPacket.encode(2, 0, 0, 0, 0, 26, 5, 4, payload)
 
     assert result[12:] == payload
+
+
+def test_encoding_timestamp():
+    result: bytearray = RtpPacket.encode(2, 0, 0, 0, 0, 26, 5, 4, bytearray(5), timestamp=123456)
+    assert int(result[4:8].hex(), 16) == 123456
+
+
+def test_jpeg_header():
+    header = encode_jpeg_header(70000, 384, 288)
+    assert len(header) == JPEG_HEADER_SIZE
+    assert decode_jpeg_header(header) == (70000, 384, 288)
+
+    with pytest.raises(OverflowError):
+        encode_jpeg_header(1 << 24, 384, 288)
+
+
+def test_fragment_frame():
+    frame = random.randbytes(1000)
+    fragments = list(fragment_frame(frame, 300))
+
+    assert [offset for offset, _ in fragments] == [0, 300, 600, 900]
+    assert b"".join(fragments[i][1] for i in range(len(fragments))) == frame
+    assert len(list(fragment_frame(bytes(5), 300))) == 1
+
+
+def test_decoding():
+    payload: bytes = random.randbytes(PAYLOAD_MAX_SIZE)
+    packet = RtpPacket()
+    packet.decode(RtpPacket.encode(2, 0, 0, 0, 1, 26, 50000, 1234, payload, timestamp=90000))
+
+    assert packet.get_version() == 2
+    assert packet.get_marker() == 1
+    assert packet.get_payload_type() == 26
+    assert packet.get_seq_num() == 50000
+    assert packet.get_timestamp() == 90000
+    assert packet.get_ssrc() == 1234
+    assert isinstance(packet.get_payload(), memoryview)
+    assert packet.get_payload() == payload
+
+
+def test_pack_header_into():
+    buffer = bytearray(2 * HEADER_SIZE)
+    RtpPacket.pack_header_into(buffer, HEADER_SIZE, 2, 0, 0, 0, 1, 26, 7, 99, timestamp=5)
+
+    assert buffer[:HEADER_SIZE] == bytes(HEADER_SIZE)
+    assert buffer[HEADER_SIZE:] == RtpPacket.encode_header(2, 0, 0, 0, 1, 26, 7, 99, timestamp=5)
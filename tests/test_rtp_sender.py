@@ -0,0 +1,42 @@
+from client_utils import FrameAssembler
+from rtp_packet import RtpPacket
+from rtp_sender import RtpSender, MEDIA_CLOCK_RATE
+
+FRAME_RATE = 20
+
+
+def decode(buffers) -> RtpPacket:
+    packet = RtpPacket()
+    packet.decode(b"".join(buffers))
+    return packet
+
+
+def test_media_clock():
+    sender = RtpSender(FRAME_RATE)
+    sender.timestamp_base = 2 ** 32 - 1000
+
+    assert sender.timestamp(FRAME_RATE) - sender.timestamp(0) == MEDIA_CLOCK_RATE - 2 ** 32
+    assert sender.timestamp(1) == (sender.timestamp(0) + MEDIA_CLOCK_RATE // FRAME_RATE) % 2 ** 32
+
+
+def test_fragments_share_frame_fields():
+    sender = RtpSender(FRAME_RATE, (384, 288), max_packet_size=120)
+    packets = [decode(buffers) for buffers in sender.packetize(bytes(1000), 3)]
+
+    assert len(packets) == 10
+    assert {packet.get_timestamp() for packet in packets} == {sender.timestamp(3)}
+    assert {packet.get_ssrc() for packet in packets} == {sender.ssrc}
+    assert [packet.get_marker() for packet in packets] == [0] * 9 + [1]
+
+
+def test_sequence_number_wraps():
+    sender = RtpSender(FRAME_RATE, max_packet_size=120)
+    sender.seq_num = 65534
+
+    assembler = FrameAssembler()
+    frames = [bytes([frame_nbr]) * 300 for frame_nbr in range(3)]
+    for frame_nbr, frame in enumerate(frames):
+        packets = [decode(buffers) for buffers in sender.packetize(frame, frame_nbr)]
+        assert [assembler.push(packet) for packet in packets][-1] == frame
+
+    assert sender.seq_num == (65534 + 9) % 65536
@@ -0,0 +1,83 @@
+import random
+
+import pytest
+
+from rtsp_parser import RtspParser, RtspParseError, is_multicast, parse_client_port, parse_multicast_address, \
+    parse_request
+
+SETUP_REQUEST = b"SETUP movie.mjpeg RTSP/1.0\nCSeq: 1\nTransport: RTP/UDP; client_port= 25000\n\n"
+PLAY_REQUEST = b"PLAY movie.mjpeg RTSP/1.0\r\nCSeq: 2\r\nSession: 123456\r\n\r\n"
+SWITCH_REQUEST = b"SWITCH RTSP/1.0\nCSeq: 3\n\n"
+
+
+def test_parse_request():
+    request = parse_request(SETUP_REQUEST.rstrip())
+    assert (request.method, request.uri, request.version) == ("SETUP", "movie.mjpeg", "RTSP/1.0")
+    assert request.get_cseq() == 1
+    assert parse_client_port(request.headers['transport']) == 25000
+
+    request = parse_request(SWITCH_REQUEST.rstrip())
+    assert (request.method, request.uri) == ("SWITCH", "")
+
+
+def test_multicast_transport():
+    assert is_multicast("RTP/UDP;multicast")
+    assert not is_multicast("RTP/UDP; client_port= 25000")
+    assert parse_client_port("RTP/UDP;multicast") is None
+
+    transport = "RTP/UDP;multicast;destination=239.255.42.42;port=5004"
+    assert parse_multicast_address(transport) == ("239.255.42.42", 5004)
+    assert parse_multicast_address("RTP/UDP;multicast;port=5004") is None
+
+
+def test_pipelined_requests():
+    parser = RtspParser()
+    requests = parser.feed(SETUP_REQUEST + PLAY_REQUEST + SWITCH_REQUEST)
+
+    assert [request.method for request in requests] == ["SETUP", "PLAY", "SWITCH"]
+    assert requests[1].headers == {'cseq': "2", 'session': "123456"}
+
+
+def test_request_split_across_segments():
+    parser = RtspParser()
+    assert parser.feed(PLAY_REQUEST[:20]) == []
+    assert parser.feed(PLAY_REQUEST[20:-1]) == []
+    assert [request.get_cseq() for request in parser.feed(PLAY_REQUEST[-1:])] == [2]
+
+
+def test_oversized_request():
+    parser = RtspParser(max_message_size=100)
+    with pytest.raises(RtspParseError):
+        parser.feed(b"SETUP " + b"a" * 200)
+
+
+@pytest.mark.parametrize("message", [b"SETUP\nCSeq: 1", b"SETUP a HTTP/1.1\nCSeq: 1", b"PLAY a RTSP/1.0\nCSeq",
+                                     b"PLAY a RTSP/1.0\n\xff: 1"])
+def test_malformed_request(message):
+    with pytest.raises(RtspParseError):
+        parse_request(message)
+
+
+def test_fuzz_segmentation():
+    stream = (SETUP_REQUEST + PLAY_REQUEST + SWITCH_REQUEST) * 20
+    expected = [request.get_cseq() for request in RtspParser().feed(stream)]
+
+    for _ in range(200):
+        parser = RtspParser()
+        cuts = sorted(random.sample(range(1, len(stream)), random.randint(1, 50)))
+        requests = []
+        for start, end in zip([0] + cuts, cuts + [len(stream)]):
+            requests += parser.feed(stream[start:end])
+        assert [request.get_cseq() for request in requests] == expected
+
+
+def test_fuzz_garbage():
+    alphabet = b"SETUP RTSP/1.0:\r\n\n\xff" + bytes(range(32, 127))
+    for _ in range(1000):
+        parser = RtspParser(max_message_size=256)
+        data = bytes(random.choice(alphabet) for _ in range(random.randint(0, 300)))
+        try:
+            for request in parser.feed(data):
+                assert request.method and request.version.startswith("RTSP/")
+        except RtspParseError:
+            pass
@@ -41,7 +41,7 @@ def send_request(connection_socket: socket.socket, port, action, file, c_seq, se
     else:
         req += f"Session: {session}\n"
 
-    connection_socket.sendall(str.encode(req))
+    connection_socket.sendall(str.encode(req + "\n"))
     data = connection_socket.recv(1024).decode("utf-8")
     print(data)
     if int(data.split('\n')[0].split(' ')[1]) == OK:
@@ -55,7 +55,9 @@ def build_and_run_test(actions, file, server_port=SERVER_PORT):
         s.connect(('', server_port))
         for idx, action in enumerate(actions, 1):
             response, ssid = send_request(s, CLIENT_PORT, action, file, idx, ssid)
-            if response != f'RTSP/1.0 200 OK\nCSeq: {idx}\nSession: {ssid}\n':
+            # SETUP replies also carry the resolution and renditions of the video
+            if not response.startswith(f'RTSP/1.0 200 OK\nCSeq: {idx}\nSession: {ssid}\n') or \
+                    not response.endswith('\n\n'):
                 s.close()
                 return False
         s.close()
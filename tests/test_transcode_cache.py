@@ -0,0 +1,85 @@
+import os
+import pathlib
+
+from transcode_cache import TranscodeCache
+
+
+def get(cache: TranscodeCache, frame_nbr: int, size: int = 10, mtime_ns: int = 1, transcodes=None) -> bytes:
+    def transcode():
+        if transcodes is not None:
+            transcodes.append(frame_nbr)
+        return bytes([frame_nbr]) * size
+    return cache.get("a.mjpeg", mtime_ns, "half", frame_nbr, transcode)
+
+
+def test_hit_and_miss(tmp_path: pathlib.Path):
+    cache = TranscodeCache(tmp_path, 100)
+    transcodes = []
+
+    assert get(cache, 1, transcodes=transcodes) == bytes([1]) * 10
+    assert get(cache, 1, transcodes=transcodes) == bytes([1]) * 10
+    assert transcodes == [1]
+    assert cache.stats()["disk_hits"] == 1
+    assert cache.hit_rate() == 0.5
+
+    # Frames of a modified video are transcoded again
+    get(cache, 1, mtime_ns=2, transcodes=transcodes)
+    assert transcodes == [1, 1]
+
+
+def test_memory_hits(tmp_path: pathlib.Path):
+    cache = TranscodeCache(tmp_path, 100, memory_bytes=100)
+    get(cache, 1)
+    get(cache, 1)
+    get(cache, 1)
+
+    stats = cache.stats()
+    assert (stats["memory_hits"], stats["disk_hits"], stats["misses"]) == (2, 0, 1)
+    assert stats["hit_rate"] == 0.667
+
+
+def test_lru_eviction(tmp_path: pathlib.Path):
+    cache = TranscodeCache(tmp_path, 30)
+    for frame_nbr in range(3):
+        get(cache, frame_nbr)
+
+    # Touch frame 0, so frame 1 becomes the least recently used one
+    get(cache, 0)
+    get(cache, 3)
+
+    assert cache.evictions == 1
+    assert cache.current_bytes == 30
+    assert len(list(tmp_path.iterdir())) == 3
+
+    transcodes = []
+    get(cache, 0, transcodes=transcodes)
+    get(cache, 1, transcodes=transcodes)
+    assert transcodes == [1]
+
+
+def test_oversized_frame_is_not_cached(tmp_path: pathlib.Path):
+    cache = TranscodeCache(tmp_path, 5)
+    assert get(cache, 0) == bytes(10)
+    assert cache.stats()["frames"] == 0
+    assert not list(tmp_path.iterdir())
+
+
+def test_warm_start(tmp_path: pathlib.Path):
+    cache = TranscodeCache(tmp_path, 100)
+    for frame_nbr in range(3):
+        get(cache, frame_nbr)
+    (tmp_path / ".unfinished.tmp").write_bytes(bytes(10))
+
+    # Frames used last are evicted last, whatever the order they were written in
+    paths = sorted(tmp_path.glob("*.jpg"), key=lambda path: path.read_bytes()[0], reverse=True)
+    for age, path in enumerate(paths):
+        os.utime(path, ns=(age * 10 ** 9, age * 10 ** 9))
+
+    cache = TranscodeCache(tmp_path, 25)
+    assert cache.stats()["frames"] == 2
+    assert cache.current_bytes == 20
+
+    transcodes = []
+    for frame_nbr in range(3):
+        get(cache, frame_nbr, transcodes=transcodes)
+    assert transcodes == [2]
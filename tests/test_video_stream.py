@@ -0,0 +1,130 @@
+import io
+import pathlib
+import random
+
+import pytest
+from PIL import Image
+
+from frame_cache import FrameCache
+from video_stream import VideoStream, INDEX_SUFFIX, build_frame_index, load_frame_index, probe_jpeg_size
+
+FRAME_COUNT = 20
+
+
+@pytest.fixture
+def video_file(tmp_path: pathlib.Path):
+    frames = [random.randbytes(random.randint(1, 500)) for _ in range(FRAME_COUNT)]
+
+    file_path = tmp_path / "video.mjpeg"
+    with open(file_path, 'wb') as file:
+        for frame in frames:
+            file.write(f"{len(frame):05d}".encode())
+            file.write(frame)
+    return file_path, frames
+
+
+def test_build_index(video_file):
+    file_path, frames = video_file
+    index = build_frame_index(file_path)
+
+    assert len(index) == 2 * FRAME_COUNT
+    assert index[0] == 5
+    assert [index[i] for i in range(1, len(index), 2)] == [len(frame) for frame in frames]
+
+
+def test_save_and_load_index(video_file):
+    file_path, frames = video_file
+    assert load_frame_index(file_path) is None
+
+    VideoStream(file_path).save_index()
+    assert file_path.with_suffix(INDEX_SUFFIX).exists()
+    assert load_frame_index(file_path) == build_frame_index(file_path)
+
+
+def test_frame_at(video_file):
+    file_path, frames = video_file
+    stream = VideoStream(file_path)
+
+    assert stream.frame_count() == FRAME_COUNT
+    for frame_nbr in random.sample(range(FRAME_COUNT), FRAME_COUNT):
+        assert stream.frame_at(frame_nbr) == frames[frame_nbr]
+
+    # Random access should not move the stream position
+    assert stream.next_frame() == frames[0]
+
+    with pytest.raises(IndexError):
+        stream.frame_at(FRAME_COUNT)
+
+
+def test_seek_frame(video_file):
+    file_path, frames = video_file
+    stream = VideoStream(file_path)
+
+    stream.seek_frame(7)
+    assert stream.frame_nbr() == 7
+    assert stream.next_frame() == frames[7]
+    assert stream.frame_nbr() == 8
+
+    stream.seek_frame(FRAME_COUNT)
+    assert not stream.next_frame()
+
+    with pytest.raises(IndexError):
+        stream.seek_frame(FRAME_COUNT + 1)
+
+
+def test_mmap_frames(video_file):
+    file_path, frames = video_file
+    stream = VideoStream(file_path, use_mmap=True)
+
+    frame = stream.next_frame()
+    assert isinstance(frame, memoryview)
+    assert frame == frames[0]
+
+    stream.seek_frame(FRAME_COUNT - 1)
+    assert stream.next_frame() == frames[-1]
+    assert not stream.next_frame()
+    stream.close()
+
+
+def test_mmap_truncated_video(video_file):
+    file_path, frames = video_file
+    stream = VideoStream(file_path, use_mmap=True)
+    assert stream.next_frame() == frames[0]
+
+    # Frames past the new end of the file must not be touched, it would crash with SIGBUS
+    with open(file_path, 'r+b') as file:
+        file.truncate(0)
+    with pytest.raises(IndexError):
+        stream.frame_at(FRAME_COUNT - 1)
+    assert not stream.next_frame()
+    stream.close()
+
+
+def test_frames_through_cache(video_file):
+    file_path, frames = video_file
+    frame_cache = FrameCache(10 ** 6)
+
+    for _ in range(2):
+        stream = VideoStream(file_path, frame_cache=frame_cache)
+        assert [stream.next_frame() for _ in range(FRAME_COUNT)] == frames
+        assert not stream.next_frame()
+
+    assert frame_cache.misses == FRAME_COUNT
+    assert frame_cache.hits == FRAME_COUNT
+
+
+@pytest.mark.parametrize("options", [{}, {'progressive': True}, {'exif': b"Exif\x00\x00" + bytes(2000)}])
+def test_probe_jpeg_size(tmp_path: pathlib.Path, options):
+    data = io.BytesIO()
+    Image.new('RGB', (321, 123)).save(data, 'JPEG', **options)
+
+    file_path = tmp_path / "frame.jpg"
+    file_path.write_bytes(b"00000" + data.getvalue())
+    with open(file_path, 'rb') as file:
+        assert probe_jpeg_size(file, 5, len(data.getvalue())) == (321, 123)
+
+
+def test_probe_jpeg_size_not_jpeg(video_file):
+    file_path, frames = video_file
+    with open(file_path, 'rb') as file:
+        assert probe_jpeg_size(file, 5, len(frames[0])) is None
@@ -0,0 +1,152 @@
+import hashlib
+import os
+import pathlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Union
+
+from frame_cache import FrameCache
+from video_stream import write_atomically
+
+
+class TranscodeCache:
+    """
+    Bounded cache of frames transcoded from the videos, e.g. downscaled for a rendition.
+
+    Frames are keyed by (file, mtime, rendition, frame number), so frames of a video modified
+    since are never served, they age out instead. They are written atomically to `folder`,
+    at most `max_bytes` of them, evicted in least-recently-used order. The most used ones
+    are also kept in memory, up to `memory_bytes`.
+
+    Frames found in the folder on start are reused, the least recently used evicted first.
+    Each server process accounts for the frames it writes or found on start only, so
+    processes sharing the folder may together exceed `max_bytes` until restarted.
+    """
+
+    SUFFIX = ".jpg"
+
+    def __init__(self, folder: pathlib.Path, max_bytes: int, memory_bytes: int = 0):
+        self.folder: pathlib.Path = folder
+        self.max_bytes: int = max_bytes
+        self.current_bytes: int = 0
+
+        self.disk_hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+
+        self.memory: Optional[FrameCache] = FrameCache(memory_bytes) if memory_bytes > 0 else None
+
+        # File name to size of the frames on disk, in least-recently-used order
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self._load()
+
+    def get(self, video_file: str, mtime_ns: int, rendition: str, frame_nbr: int,
+            transcode: Callable[[], bytes]) -> bytes:
+        """Return the cached frame of a rendition, transcoding and caching it with `transcode` on a miss."""
+        name = hashlib.sha1(f"{video_file}\0{mtime_ns}\0{rendition}\0{frame_nbr}".encode()).hexdigest() + self.SUFFIX
+        with self._lock:
+            if name in self._entries:
+                self._entries.move_to_end(name)
+
+        if self.memory is None:
+            return self._load_frame(name, transcode)
+        return self.memory.get(name, lambda: self._load_frame(name, transcode))
+
+    def hit_rate(self) -> float:
+        """Return the fraction of frames served from memory or disk rather than transcoded, 0 before any request."""
+        memory_hits = self.memory.hits if self.memory else 0
+        with self._lock:
+            hits = memory_hits + self.disk_hits
+            requests = hits + self.misses
+        return hits / requests if requests else 0.0
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        """Return the cache counters."""
+        memory_stats = self.memory.stats() if self.memory else {}
+        hit_rate = self.hit_rate()
+        with self._lock:
+            return {
+                "memory_hits": memory_stats.get("hits", 0),
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(hit_rate, 3),
+                "evictions": self.evictions,
+                "frames": len(self._entries),
+                "bytes": self.current_bytes,
+                "memory_bytes": memory_stats.get("bytes", 0),
+            }
+
+    def _load_frame(self, name: str, transcode: Callable[[], bytes]) -> bytes:
+        path = self.folder / name
+        with self._lock:
+            on_disk = name in self._entries
+        if on_disk:
+            try:
+                data = path.read_bytes()
+                # The mtime orders frames on disk by last use, for the next warm start
+                os.utime(path)
+            except OSError:
+                # Removed behind our back, e.g. by another server process
+                with self._lock:
+                    self.current_bytes -= self._entries.pop(name, 0)
+            else:
+                with self._lock:
+                    self.disk_hits += 1
+                return data
+
+        with self._lock:
+            self.misses += 1
+        data = bytes(transcode())
+        if len(data) > self.max_bytes:
+            return data
+
+        try:
+            write_atomically(path, data)
+        except OSError:
+            # Disk full or read-only, the frame is served all the same
+            return data
+
+        with self._lock:
+            self.current_bytes += len(data) - self._entries.pop(name, 0)
+            self._entries[name] = len(data)
+            evicted = self._evict()
+        self._remove(evicted)
+        return data
+
+    def _load(self) -> None:
+        # Warm start from the frames of previous runs, least recently used first
+        files = []
+        for path in self.folder.iterdir():
+            # Temporary files of unfinished writes are left out
+            if path.suffix != self.SUFFIX:
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime_ns, path.name, stat.st_size))
+
+        with self._lock:
+            for _, name, size in sorted(files):
+                self._entries[name] = size
+                self.current_bytes += size
+            # The cap may have been lowered since
+            evicted = self._evict()
+        self._remove(evicted)
+
+    def _evict(self) -> List[str]:
+        # Called with the lock held, files are removed after it is released
+        evicted = []
+        while self.current_bytes > self.max_bytes:
+            name, size = self._entries.popitem(last=False)
+            self.current_bytes -= size
+            self.evictions += 1
+            evicted.append(name)
+        return evicted
+
+    def _remove(self, names: List[str]) -> None:
+        for name in names:
+            (self.folder / name).unlink(missing_ok=True)
@@ -1,14 +1,229 @@
+import array
+import datetime
+import functools
+import math
+import mmap
+import os
+import pathlib
+import struct
+import sys
+import threading
+from typing import BinaryIO, Dict, Iterable, Optional, Tuple, Union
+
+from frame_cache import FrameCache
+
+FRAME_LENGTH_SIZE = 5
+INDEX_SUFFIX = ".index"
+INFO_SUFFIX = ".info"
+DEFAULT_FRAME_RATE = 20
+
+# JPEG start of frame markers, holding the image dimensions (all SOFn but DHT, JPG and DAC)
+_SOF_MARKERS = frozenset(range(0xc0, 0xd0)) - {0xc4, 0xc8, 0xcc}
+# Markers without a length field
+_STANDALONE_MARKERS = frozenset(range(0xd0, 0xda)) | {0x01}
+
+# Info fields identifying the version of the video they describe, not meant for clients
+SIDECAR_FIELDS = ('size', 'mtime')
+
+
+def build_frame_index(filename) -> array.array:
+    """
+    Scan a MJPEG file and return its frame index.
+
+    The index is a flat array of (offset, length) pairs, where offset points to the
+    first byte of the frame (right after its 5-byte length prefix).
+    """
+    index = array.array('Q')
+    with open(filename, 'rb') as file:
+        while True:
+            data = file.read(FRAME_LENGTH_SIZE)
+            if not data:
+                break
+
+            frame_length = int(data)
+            index.append(file.tell())
+            index.append(frame_length)
+            file.seek(frame_length, 1)
+    return index
+
+
+def probe_jpeg_size(file: BinaryIO, offset: int, length: int) -> Optional[Tuple[int, int]]:
+    """
+    Return the (width, height) of the JPEG frame at `offset`, or None if it has no SOF marker.
+
+    Only marker segment headers are read, other segments are skipped with `seek`.
+    """
+    end = offset + length
+    file.seek(offset)
+    if file.read(2) != b"\xff\xd8":
+        return None
+
+    while file.tell() + 4 <= end:
+        marker = file.read(2)
+        if marker[0] != 0xff:
+            return None
+        if marker[1] == 0xff:
+            # Fill byte before a marker
+            file.seek(-1, 1)
+            continue
+        if marker[1] in _STANDALONE_MARKERS:
+            continue
+
+        segment_length, = struct.unpack("!H", file.read(2))
+        if marker[1] in _SOF_MARKERS:
+            # Sample precision, then height and width
+            _, height, width = struct.unpack("!BHH", file.read(5))
+            return width, height
+        if marker[1] == 0xda:
+            # Start of scan, no frame header precedes the entropy-coded data
+            return None
+        file.seek(segment_length - 2, 1)
+    return None
+
+
+def write_frame_index(filename, index: array.array) -> None:
+    """Write the frame index as a sidecar file next to the video."""
+    index = array.array('Q', index)
+    if sys.byteorder != 'little':
+        index.byteswap()
+
+    write_atomically(pathlib.Path(filename).with_suffix(INDEX_SUFFIX), index.tobytes())
+
+
+def load_frame_index(filename) -> Optional[array.array]:
+    """Load the sidecar frame index of a video, or None if it is missing or outdated."""
+    video_file = pathlib.Path(filename)
+    index_file_path = video_file.with_suffix(INDEX_SUFFIX)
+    try:
+        if index_file_path.stat().st_mtime < video_file.stat().st_mtime:
+            return None
+
+        index = array.array('Q')
+        with open(index_file_path, 'rb') as index_file:
+            index.frombytes(index_file.read())
+    except (OSError, ValueError):
+        return None
+
+    if sys.byteorder != 'little':
+        index.byteswap()
+    return index
+
+
+def load_video_info(filename) -> Dict[str, str]:
+    """Read the `key=value` fields of the info file of a video."""
+    info = {}
+    try:
+        with open(pathlib.Path(filename).with_suffix(INFO_SUFFIX), 'r') as info_file:
+            for line in info_file:
+                key, _, value = line.strip().partition('=')
+                if key:
+                    info[key] = value
+    except OSError:
+        pass
+    return info
+
+
+def video_info_is_current(filename) -> bool:
+    """Return whether the info and index files of a video match its current size and mtime."""
+    video_file = pathlib.Path(filename)
+    try:
+        stat = video_file.stat()
+        if video_file.with_suffix(INDEX_SUFFIX).stat().st_mtime < stat.st_mtime:
+            return False
+    except OSError:
+        return False
+
+    info = load_video_info(video_file)
+    return info.get('size') == str(stat.st_size) and info.get('mtime') == str(stat.st_mtime_ns)
+
+
+def generate_video_info(filename, frame_rate: int = DEFAULT_FRAME_RATE) -> Dict[str, str]:
+    """Scan a video, write its index and info files and return its info."""
+    video_file = pathlib.Path(filename)
+    # Stat before scanning, so that a file modified meanwhile is outdated rather than wrongly current
+    stat = video_file.stat()
+    index = build_frame_index(video_file)
+    write_frame_index(video_file, index)
+
+    info = {'filename': video_file.name}
+    if index:
+        with open(video_file, 'rb') as file:
+            size = probe_jpeg_size(file, index[0], index[1])
+        if size:
+            info['resolution'] = f"{size[0]}x{size[1]}"
+    info['frame_rate'] = str(frame_rate)
+    info['duration'] = str(datetime.timedelta(seconds=math.ceil(len(index) // 2 / frame_rate)))
+    info['size'] = str(stat.st_size)
+    info['mtime'] = str(stat.st_mtime_ns)
+
+    data = "".join(f"{key}={value}\n" for key, value in info.items())
+    write_atomically(video_file.with_suffix(INFO_SUFFIX), data.encode("utf-8"))
+    return info
+
+
+def write_atomically(path: pathlib.Path, data: Union[bytes, Iterable[bytes]]) -> None:
+    """Write a file from bytes or chunks of bytes, replaced at once so that concurrent readers never see it partial."""
+    temp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(temp_path, 'wb') as file:
+            if isinstance(data, (bytes, bytearray)):
+                file.write(data)
+            else:
+                file.writelines(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
+
+
 class VideoStream:
-    def __init__(self, filename):
+    def __init__(self, filename, use_mmap: bool = False, frame_cache: Optional[FrameCache] = None):
+        """
+        Open a MJPEG video.
+
+        With `use_mmap`, the file is memory-mapped and frames are returned as `memoryview`
+        slices over the mapping, so sessions streaming the same file share the page cache
+        instead of copying every frame onto the heap. Frames past the end of a file truncated
+        since are not returned, but one truncated while a frame is being sent still crashes
+        the process with SIGBUS.
+
+        Otherwise, frames are read through `frame_cache` if one is given, so a file watched
+        by many sessions is only read from disk once.
+        """
         self.filename = filename
         try:
             self.file = open(filename, 'rb')
         except Exception:
             raise IOError
         self._frame_num: int = 0
+        self._index: Optional[array.array] = load_frame_index(filename)
+        self._frame_cache: Optional[FrameCache] = frame_cache
+        self._cache_key: str = str(pathlib.Path(filename).resolve())
 
-    def next_frame(self) -> bytes:
+        self._map: Optional[mmap.mmap] = None
+        self._view: Optional[memoryview] = None
+        if use_mmap and os.fstat(self.file.fileno()).st_size > 0:
+            self._map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._view = memoryview(self._map)
+
+    def next_frame(self) -> Union[bytes, memoryview]:
         """Get next frame."""
+        if self._view is not None or self._frame_cache is not None:
+            if self._frame_num >= self.frame_count():
+                return b''
+
+            if self._view is not None:
+                try:
+                    data = self.frame_at(self._frame_num)
+                except IndexError:
+                    # The video was truncated, it ends here
+                    return b''
+            else:
+                data = self._frame_cache.get((self._cache_key, self._frame_num),
+                                             functools.partial(self.frame_at, self._frame_num))
+            self._frame_num += 1
+            return data
+
         data = self.file.read(5)  # Get the frame_length from the first 5 bits
         if data:
             frame_length = int(data)
@@ -22,6 +237,64 @@ class VideoStream:
         """Get frame number."""
         return self._frame_num
 
+    def frame_count(self) -> int:
+        """Get total number of frames."""
+        return len(self._get_index()) // 2
+
+    def seek_frame(self, frame_nbr: int) -> None:
+        """Move to frame `frame_nbr` (0-based), so it is returned by the next `next_frame` call."""
+        index = self._get_index()
+        if frame_nbr == len(index) // 2:
+            self.file.seek(0, 2)
+        elif 0 <= frame_nbr < len(index) // 2:
+            self.file.seek(index[2 * frame_nbr] - FRAME_LENGTH_SIZE)
+        else:
+            raise IndexError("Frame number out of range")
+        self._frame_num = frame_nbr
+
+    def frame_at(self, frame_nbr: int) -> Union[bytes, memoryview]:
+        """Get frame `frame_nbr` (0-based) without moving the stream position."""
+        index = self._get_index()
+        if not 0 <= frame_nbr < len(index) // 2:
+            raise IndexError("Frame number out of range")
+
+        if self._view is not None:
+            offset = index[2 * frame_nbr]
+            end = offset + index[2 * frame_nbr + 1]
+            # Touching pages past the end of a file truncated since it was mapped raises SIGBUS, killing the process
+            if end > os.fstat(self.file.fileno()).st_size:
+                raise IndexError("Frame past the end of the video, truncated while mapped")
+            return self._view[offset:end]
+
+        position = self.file.tell()
+        try:
+            self.file.seek(index[2 * frame_nbr])
+            return self.file.read(index[2 * frame_nbr + 1])
+        finally:
+            self.file.seek(position)
+
+    def save_index(self) -> None:
+        """Write the frame index as a sidecar file, so it can be loaded on open."""
+        write_frame_index(self.filename, self._get_index())
+
+    def _get_index(self) -> array.array:
+        # Fall back to scanning the file if no sidecar index could be loaded
+        if self._index is None:
+            self._index = build_frame_index(self.filename)
+        return self._index
+
+    def close(self) -> None:
+        if self._view is not None:
+            self._view.release()
+            try:
+                self._map.close()
+            except BufferError:
+                # Frames handed out are still referenced, the mapping is released along with them
+                pass
+            self._view = None
+            self._map = None
+        self.file.close()
+
     def __del__(self):
         """Destructor."""
-        self.file.close()
+        self.close()